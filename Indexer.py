@@ -1,16 +1,20 @@
 import os
 import json
-from azure.storage.blob import BlobServiceClient
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
     SearchIndex, SimpleField, SearchableField, VectorSearch, VectorSearchProfile, HnswParameters
 )
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from pypdf import PdfReader
 import openai
 import tiktoken
+from embedding_client import EmbeddingClient
+from chunking import Chunker
+from pdf_extract import extract_texts
+from packing import PACK_INDEX_NAME, is_pack_index, iter_packed
+from storage import get_storage
 
 # Azure Configurations
 AZURE_BLOB_CONNECTION_STRING = "your_azure_blob_connection_string"
@@ -21,12 +25,16 @@ AZURE_SEARCH_INDEX_NAME = "your_index_name"
 AZURE_OPENAI_API_KEY = "your_openai_api_key"
 AZURE_OPENAI_DEPLOYMENT = "gpt-4o"
 
+# Indexing pipeline configuration
+INDEX_UPLOAD_BATCH_SIZE = int(os.getenv("INDEX_UPLOAD_BATCH_SIZE", "500"))  # Search documents per upload call
+
 # Initialize OpenAI API
 openai.api_key = AZURE_OPENAI_API_KEY
+# Chunks are embedded many per request, several requests at a time
+embedder = EmbeddingClient.from_openai(openai, "text-embedding-ada-002")
 
-# Initialize Azure Blob Storage Client
-blob_service_client = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
-container_client = blob_service_client.get_container_client(AZURE_BLOB_CONTAINER_NAME)
+# Initialize the storage backend (Azure Blob Storage, or a local mirror with STORAGE_BACKEND=local)
+storage = get_storage(AZURE_BLOB_CONNECTION_STRING)
 
 # Initialize Azure AI Search Client
 search_client = SearchClient(AZURE_SEARCH_ENDPOINT, AZURE_SEARCH_INDEX_NAME, AzureKeyCredential(AZURE_SEARCH_KEY))
@@ -34,52 +42,82 @@ index_client = SearchIndexClient(AZURE_SEARCH_ENDPOINT, AzureKeyCredential(AZURE
 
 
 # Function to Read PDFs from Azure Blob Storage
+def iter_pdf_bytes():
+    # Year/case prefixes are listed in parallel and PDFs are read as they are found
+    for blob in storage.list(AZURE_BLOB_CONTAINER_NAME, suffixes=(".pdf", PACK_INDEX_NAME)):
+        if is_pack_index(blob.name):
+            # PDFs packed into a docket archive are fetched one range request each
+            yield from iter_packed(storage, AZURE_BLOB_CONTAINER_NAME, blob.name, suffixes=".pdf")
+        else:
+            yield blob.name, storage.download(AZURE_BLOB_CONTAINER_NAME, blob.name)
+
+
 def read_pdfs_from_blob():
-    pdf_texts = []
-    blob_list = container_client.list_blobs()
+    """Yield (name, text) per PDF; text is extracted on a process pool while the next PDFs download."""
+    return extract_texts(iter_pdf_bytes())
 
-    for blob in blob_list:
-        if blob.name.endswith(".pdf"):
-            blob_client = container_client.get_blob_client(blob.name)
-            pdf_bytes = blob_client.download_blob().readall()
 
-            reader = PdfReader(pdf_bytes)
-            text = "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
-            pdf_texts.append((blob.name, text))
+# Function to Generate Embeddings using OpenAI
+def get_embedding(text):
+    return embedder.embed_texts([text])[0]
 
-    return pdf_texts
 
+# Function to Split Extracted PDFs into (id, chunk) Pairs
+def iter_chunks(pdf_texts, chunk_size=500, overlap=50):
+    chunker = Chunker(chunk_size, overlap, unit="char")
+    for doc_name, text in pdf_texts:
+        for i, chunk in enumerate(chunker.chunk_text(text)):
+            yield f"{doc_name}_{i}", chunk.text
 
-# Function to Chunk Text
-def chunk_text(text, chunk_size=500, overlap=50):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
-    return text_splitter.split_text(text)
 
+# Function to Embed Chunks as Search Documents
+def iter_search_documents(chunks):
+    for doc_id, chunk, embedding in embedder.embed(chunks):
+        yield {
+            "id": doc_id,
+            "content": chunk,
+            "vector": embedding
+        }
 
-# Function to Generate Embeddings using OpenAI
-def get_embedding(text):
-    response = openai.embeddings.create(input=[text], model="text-embedding-ada-002")
-    return response["data"][0]["embedding"]
 
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
-# Function to Index Data into Azure AI Search
-def index_documents():
-    pdf_texts = read_pdfs_from_blob()
-    documents = []
 
-    for doc_name, text in pdf_texts:
-        chunks = chunk_text(text)
-
-        for i, chunk in enumerate(chunks):
-            embedding = get_embedding(chunk)
-            doc_id = f"{doc_name}_{i}"
-            documents.append({
-                "id": doc_id,
-                "content": chunk,
-                "vector": embedding
-            })
-
-    search_client.upload_documents(documents)
+def upload_batch(documents):
+    results = search_client.upload_documents(documents)
+    return sum(1 for result in results if result.succeeded)
+
+
+# Function to Index Data into Azure AI Search
+def index_documents(batch_size=None):
+    """
+    Streams every PDF through list, download, extract, chunk, embed and upload.
+
+    Each stage pulls from the one before it, so only a few PDFs, one PDF's chunks and two
+    upload batches are held at a time however large the container is. A batch is uploaded on
+    a background thread while the next one is embedded.
+    """
+    batch_size = batch_size or INDEX_UPLOAD_BATCH_SIZE
+    documents = iter_search_documents(iter_chunks(read_pdfs_from_blob()))
+
+    indexed = 0
+    pending = None
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-upload") as executor:
+        for batch in batched(documents, batch_size):
+            if pending is not None:
+                indexed += pending.result()
+            pending = executor.submit(upload_batch, batch)
+        if pending is not None:
+            indexed += pending.result()
+    print(f"Indexed {indexed} chunks.")
+    print(embedder.summary())
+    return indexed
 
 
 # Function to Create an Azure AI Search Index
@@ -1,21 +1,10 @@
-# Ensure destination container exists, or create it
-try:
-    if not dest_container.exists():
-        dest_container.create_container()
-    else:
-        print(f"Container '{DEST_CONTAINER_NAME}' already exists. Overwriting existing blobs...")
-        for blob in dest_container.list_blobs():
-            dest_container.get_blob_client(blob).delete_blob()
-except Exception as e:
-    print(f"Error handling destination container: {e}")
-
-
-
-from PyPDF2 import PdfReader
+from pdf_extract import extract_pages
+from chunking import chunk_pages
+from embedding_client import EmbeddingClient
 from sentence_transformers import SentenceTransformer
-from azure.storage.blob import BlobServiceClient
+from storage import get_storage
+from index_state import INDEX_MODE, update_vectors
 import os
-import json
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -28,69 +17,61 @@ DEST_CONTAINER_NAME = os.getenv("DEST_CONTAINER_NAME")
 AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY")
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_EMBEDDING_DEPLOYMENT_ID = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_ID")
+VECTORS_BLOB_NAME = "docVectors_azure.json"  # Stored as binary shards under docVectors_azure/ unless VECTORS_FORMAT=json
 
-# Initialize Azure Blob Service Client
-blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+# Initialize the storage backend (Azure Blob Storage, or a local mirror with STORAGE_BACKEND=local)
+storage = get_storage(AZURE_STORAGE_CONNECTION_STRING)
 
 # Define OpenAI client
 from openai import AzureOpenAI
 client = AzureOpenAI(api_key=AZURE_OPENAI_KEY, azure_endpoint=AZURE_OPENAI_ENDPOINT)
+# Chunks are embedded many per request, several requests at a time
+embedder = EmbeddingClient.from_openai(client, AZURE_OPENAI_EMBEDDING_DEPLOYMENT_ID)
 
-# Function to extract text from PDF
-def get_pdf_text(blob_client):
-    pdf_text = ""
-    stream = blob_client.download_blob()
-    reader = PdfReader(stream.readall())
-    for page in reader.pages:
-        pdf_text += page.extract_text() + " "
-    return pdf_text.strip()
+# Function to extract the pages of PDFs, on a process pool
+def get_pdf_pages(container, blob_names):
+    """Yield (blob name, page texts) in order; PDFs that fail or time out are logged and skipped."""
+    documents = ((blob_name, storage.download(container, blob_name)) for blob_name in blob_names)
+    return extract_pages(documents)
 
-# Function to split text into chunks
-def get_chunks(text, chunk_length=500):
-    chunks = []
-    while len(text) > chunk_length:
-        last_period_index = text[:chunk_length].rfind('.')
-        if last_period_index == -1:
-            last_period_index = chunk_length
-        chunks.append(text[:last_period_index])
-        text = text[last_period_index+1:]
-    chunks.append(text)
-    return chunks
+# Function to split extracted PDFs into chunks keyed by (blob name, chunk number, page, start, end)
+def iter_chunks(pdf_pages, extracted, chunk_length=500):
+    for blob_name, pages in pdf_pages:
+        print(f"Processing {blob_name}...")
+        extracted(blob_name)
+        # Chunks are cut between words, preferably after a sentence
+        for i, chunk in enumerate(chunk_pages(pages, size=chunk_length, unit="char", separator=" ")):
+            yield (blob_name, i, chunk.page, chunk.start, chunk.end), chunk.text
 
-# Function to create embeddings
-def create_embeddings(text):
-    return client.embeddings.create(input=[text], model=AZURE_OPENAI_EMBEDDING_DEPLOYMENT_ID).data[0].embedding
+# Function to extract, chunk and embed PDFs into vector records
+def index_pdfs(blob_names, extracted):
+    chunks = iter_chunks(get_pdf_pages(SOURCE_CONTAINER_NAME, blob_names), extracted)
+    for (blob_name, i, page, start, end), chunk, embedding in embedder.embed(chunks):
+        yield {
+            "id": f"{blob_name}_{i}",
+            "filename": blob_name,
+            "text": chunk,
+            "page": page,
+            "start": start,
+            "end": end,
+            "embedding": embedding
+        }
 
-# Function to process PDFs, generate embeddings, and store results
+# Function to process new and changed PDFs and merge their embeddings into the stored vectors
 def process_pdfs():
-    source_container = blob_service_client.get_container_client(SOURCE_CONTAINER_NAME)
-    dest_container = blob_service_client.get_container_client(DEST_CONTAINER_NAME)
-    dest_container.create_container()
+    # A full rebuild starts from an empty destination container
+    if INDEX_MODE == "full":
+        storage.ensure_container(DEST_CONTAINER_NAME)
+        print(f"Full re-index: deleting existing blobs in '{DEST_CONTAINER_NAME}'...")
+        for blob in list(storage.list(DEST_CONTAINER_NAME)):
+            storage.delete(DEST_CONTAINER_NAME, blob.name)
 
-    embeddings_data = []
-    for blob in source_container.list_blobs():
-        if not blob.name.endswith(".pdf"):
-            print(f"Skipping non-PDF file: {blob.name}")
-            continue
-        
-        print(f"Processing {blob.name}...")
-        blob_client = source_container.get_blob_client(blob)
-        text = get_pdf_text(blob_client)
-        chunks = get_chunks(text)
-        
-        for i, chunk in enumerate(chunks):
-            embeddings_data.append({
-                "id": f"{blob.name}_{i}",
-                "filename": blob.name,
-                "text": chunk,
-                "embedding": create_embeddings(chunk)
-            })
-    
-    # Save embeddings data to JSON
-    json_data = json.dumps(embeddings_data)
-    dest_blob_client = dest_container.get_blob_client("docVectors_azure.json")
-    dest_blob_client.upload_blob(json_data, overwrite=True)
+    plan = update_vectors(storage, SOURCE_CONTAINER_NAME, DEST_CONTAINER_NAME, VECTORS_BLOB_NAME, index_pdfs)
+    print(f"Processed {len(plan.new)} new and {len(plan.changed)} changed PDFs, "
+          f"removed {len(plan.removed)}, skipped {len(plan.unchanged)} unchanged.")
     print("Embeddings stored successfully.")
+    print(embedder.summary())
 
-# Run the processing function
-process_pdfs()
+# Run the processing function (guarded: extraction workers may re-import this module)
+if __name__ == "__main__":
+    process_pdfs()
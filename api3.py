@@ -3,8 +3,11 @@ from pydantic import BaseModel
 import os
 import re
 import requests
-from bs4 import BeautifulSoup
+import http_client
+from link_extractor import find_document_links
+from jobs import add_job_routes
 from azure.storage.blob import BlobServiceClient
+from blob_transfer import transfer_document
 
 # Azure Blob Storage configuration
 AZURE_CONNECTION_STRING = "<AZURE_CONNECTION_STRING>"  # Replace with your Azure connection string
@@ -27,60 +30,46 @@ def get_docket_number_from_url(url):
 def download_and_upload_document(document_url, folder_name, document_name):
     """Download a document and upload it to Azure Blob Storage."""
     try:
-        # Download the document
-        response = requests.get(document_url, stream=True)
-        response.raise_for_status()
-
-        # Upload the document to Azure Blob Storage
         blob_client = container_client.get_blob_client(blob=f"{folder_name}/{document_name}")
-        blob_client.upload_blob(response.content, overwrite=True)
+        # Stream the document into the blob block by block
+        transfer_document(document_url, blob_client)
         print(f"Uploaded {document_name} to folder {folder_name} in Azure Blob Storage.")
     except Exception as e:
         print(f"Failed to process {document_url}: {e}")
 
-def scrape_documents(url):
-    """Scrape the webpage for document links and upload them."""
+def scrape_documents(url, report=None):
+    """Scrape the webpage for document links and upload them, reporting each document as it is uploaded."""
     docket_number = get_docket_number_from_url(url)
     results = {"url": url, "docket_number": docket_number, "documents": []}
 
     try:
-        # Ensure the folder exists in the Azure container
+        # Blob paths under the docket act as its folder; the manifest tracks what is stored
         folder_name = docket_number
-        container_client.get_blob_client(blob=f"{folder_name}/").upload_blob(b"", overwrite=True)
 
         # Fetch the webpage content
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
 
-        # Parse the webpage
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find all links with .pdf or .docx
-        document_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx)$'))
+        # Find all document links in a single pass over the page
+        document_links = find_document_links(response.text, r'\.(pdf|docx)$')
 
         for link in document_links:
-            document_url = link['href']
-            document_name = link.text.strip() or document_url.split('/')[-1]
+            document_url = link.href
+            document_name = link.text or document_url.split('/')[-1]
             full_document_url = requests.compat.urljoin(url, document_url)
 
             # Download and upload each document
             download_and_upload_document(full_document_url, folder_name, document_name)
-            results["documents"].append({"name": document_name, "url": full_document_url})
+            document = {"name": document_name, "url": full_document_url}
+            results["documents"].append(document)
+            if report is not None:
+                report({"url": url, "status": "uploaded", "document": document})
     except Exception as e:
         print(f"Error while scraping {url}: {e}")
         raise HTTPException(status_code=500, detail=f"Error while scraping {url}: {e}")
 
-    return results
+    # Reported documents are not returned again, so each one is listed once
+    return results if report is None else None
 
-@app.post("/scrape")
-async def scrape_endpoint(request: ScrapeRequest):
-    """API endpoint to scrape documents from a list of URLs."""
-    results = []
-    for url in request.urls:
-        try:
-            print(f"Processing URL: {url}")
-            result = scrape_documents(url)
-            results.append(result)
-        except Exception as e:
-            results.append({"url": url, "error": str(e)})
-    return {"results": results}
+# Scrape requests run as background jobs; poll /scrape/{job_id} or stream /scrape/{job_id}/stream
+add_job_routes(app, "/scrape", scrape_documents, ScrapeRequest)
@@ -2,20 +2,13 @@ from fastapi import FastAPI
 from pydantic import BaseModel
 from crawler.case_scraper import scrape_case_documents
 from crawler.docket_scraper import scrape_docket_documents
+from jobs import add_job_routes
 
 app = FastAPI()
 
 class ScrapeRequest(BaseModel):
     urls: list[str]
 
-@app.post("/scrape/case")
-def scrape_case_endpoint(request: ScrapeRequest):
-    for url in request.urls:
-        scrape_case_documents(url)
-    return {"status": "success", "message": "Case scraping completed."}
-
-@app.post("/scrape/docket")
-def scrape_docket_endpoint(request: ScrapeRequest):
-    for url in request.urls:
-        scrape_docket_documents(url)
-    return {"status": "success", "message": "Docket scraping completed."}
+# Scrape requests run as background jobs; poll /scrape/<kind>/{job_id} or stream /scrape/<kind>/{job_id}/stream
+add_job_routes(app, "/scrape/case", scrape_case_documents, ScrapeRequest)
+add_job_routes(app, "/scrape/docket", scrape_docket_documents, ScrapeRequest)
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import logging
+import os
+import posixpath
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import http_client
+import manifest
+import packing
+from storage import AzureStorage
+from blob_transfer import store_digested, transfer_document
+
+# Concurrency configuration
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "16"))  # Downloads in flight across all hosts
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "4"))  # Downloads in flight per host
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))  # Blob uploads in flight
+STREAM_UPLOADS = os.getenv("STREAM_UPLOADS", "true").lower() == "true"  # Pipe downloads straight into staged blocks
+
+
+def download_document(document_url):
+    """Download a document and return its bytes."""
+    response = http_client.get(document_url, stream=True)
+    response.raise_for_status()
+    return response.content
+
+
+def upload_document(container_client, blob_path, data, metadata=None):
+    """Upload document bytes to Azure Blob Storage and return the new blob's ETag."""
+    blob_client = container_client.get_blob_client(blob=blob_path)
+    return blob_client.upload_blob(data, overwrite=True, metadata=metadata).get("etag")
+
+
+async def _fetch_all(container_client, documents, concurrency, per_host_concurrency, upload_concurrency, streaming,
+                     pack, report):
+    loop = asyncio.get_running_loop()
+    fetch_limit = asyncio.Semaphore(concurrency)
+    upload_limit = asyncio.Semaphore(upload_concurrency)
+    # Bounds how many downloaded bodies can wait for an upload slot at once
+    pipeline_limit = asyncio.Semaphore(concurrency + upload_concurrency)
+    host_limits = defaultdict(lambda: asyncio.Semaphore(per_host_concurrency))
+    stored = manifest.get_manifest()
+    container = container_client.container_name
+    # One packer per docket prefix, flushed once all of its documents are in
+    packers = {}
+    blob_storage = AzureStorage(container_clients=[container_client])
+
+    async def process(document):
+        result = await fetch(document)
+        # Packed documents are only reported once their archive is written
+        if report is not None and result["status"] != "packed":
+            report(result)
+        return result
+
+    async def fetch(document):
+        document_url = document["document_url"]
+        blob_path = document["path"]
+        host = urlsplit(document_url).netloc
+        try:
+            if manifest.MANIFEST_SKIP_KNOWN and stored.is_stored(container, blob_path, document_url):
+                # Already stored from this URL: no download, no upload
+                status = "skipped"
+            elif pack:
+                # Small documents are queued for the docket archive, larger ones streamed to their own blob
+                prefix = posixpath.dirname(blob_path)
+                packer = packers.setdefault(prefix, packing.DocketPacker(blob_storage, container, prefix))
+                async with fetch_limit, host_limits[host]:
+                    logging.info(f"Fetching document: {document_url}")
+                    blob_client = container_client.get_blob_client(blob=blob_path)
+                    status = await loop.run_in_executor(
+                        executor, packing.pack_or_transfer, packer, document_url, blob_client
+                    )
+            elif streaming:
+                # Download and upload overlap block by block inside a single transfer
+                async with fetch_limit, host_limits[host]:
+                    logging.info(f"Streaming document: {document_url}")
+                    blob_client = container_client.get_blob_client(blob=blob_path)
+                    status = await loop.run_in_executor(executor, transfer_document, document_url, blob_client)
+            else:
+                async with pipeline_limit:
+                    # Release the download slots before uploading so the next download overlaps this upload
+                    async with fetch_limit, host_limits[host]:
+                        logging.info(f"Downloading document: {document_url}")
+                        data = await loop.run_in_executor(executor, download_document, document_url)
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    blob_client = container_client.get_blob_client(blob=blob_path)
+
+                    def write(metadata):
+                        return upload_document(container_client, blob_path, data, metadata)
+
+                    # Same digest checks as a streamed transfer: unchanged bytes are not uploaded again
+                    async with upload_limit:
+                        status = await loop.run_in_executor(
+                            executor, store_digested, blob_client, document_url, len(data), sha256, write
+                        )
+            logging.info(f"Azure Blob Storage {blob_path}: {status}")
+            return {"document_url": document_url, "status": status, "path": blob_path}
+        except Exception as e:
+            logging.error(f"Error processing document {document_url}: {e}")
+            return {"document_url": document_url, "status": "error", "error": str(e)}
+
+    async def flush(prefix, packer):
+        try:
+            written = await loop.run_in_executor(executor, packer.flush)
+            logging.info(f"Packed {written} documents into {packing.index_path(prefix)}")
+        except Exception as e:
+            logging.error(f"Error writing the archive for {prefix}: {e}")
+            return prefix, str(e)
+        return prefix, None
+
+    with ThreadPoolExecutor(max_workers=concurrency + upload_concurrency) as executor:
+        results = await asyncio.gather(*(process(document) for document in documents))
+        failures = dict(await asyncio.gather(*(flush(prefix, packer) for prefix, packer in packers.items())))
+    # Packed documents only count as stored once their archive is written
+    for index, result in enumerate(results):
+        if result["status"] == "packed" and failures.get(posixpath.dirname(result["path"])):
+            error = failures[posixpath.dirname(result["path"])]
+            results[index] = {"document_url": result["document_url"], "status": "error", "error": error}
+        if report is not None and result["status"] == "packed":
+            report(results[index])
+    return results
+
+
+def fetch_documents(container_client, documents, concurrency=None, per_host_concurrency=None,
+                    upload_concurrency=None, streaming=None, pack=None, report=None):
+    """
+    Downloads documents and uploads them to Azure Blob Storage concurrently.
+
+    :param container_client: Azure container client the documents are uploaded to.
+    :param documents: Iterable of dicts with "document_url" and "path" (blob path) keys.
+    :param concurrency: Maximum downloads in flight across all hosts.
+    :param per_host_concurrency: Maximum downloads in flight against a single host.
+    :param upload_concurrency: Maximum blob uploads in flight.
+    :param streaming: Stream each download into staged blocks instead of buffering it (default STREAM_UPLOADS).
+    :param pack: Batch small documents into per-docket archives (default PACK_MODE == "small").
+    :param report: Optional callback called with each document's result as soon as it completes,
+                   possibly from another thread.
+    :return: One result dict per document, in input order.
+    """
+    coro = _fetch_all(
+        container_client,
+        list(documents),
+        concurrency or FETCH_CONCURRENCY,
+        per_host_concurrency or FETCH_PER_HOST_CONCURRENCY,
+        upload_concurrency or UPLOAD_CONCURRENCY,
+        STREAM_UPLOADS if streaming is None else streaming,
+        packing.PACK_MODE == "small" if pack is None else pack,
+        report,
+    )
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # Called from inside an event loop (e.g. an async FastAPI endpoint): run on a private loop
+    with ThreadPoolExecutor(max_workers=1) as runner:
+        return runner.submit(asyncio.run, coro).result()
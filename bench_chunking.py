@@ -0,0 +1,84 @@
+"""
+Benchmark chunking against the get_chunks loop Docupload.py and Upload.py used.
+
+Usage: python bench_chunking.py [pages ...]
+
+Synthetic filings of each page count (default 125, 250, 500 and 1000 pages) are chunked by the
+old loop and by each chunking unit. A linear chunker takes the same time per page at every size.
+The old loop re-slices the remaining text for every chunk, so its time per page grows with the
+filing. Sentence mode is also run on the same pages with their punctuation removed, where every
+sentence is cut at the chunker's max_sentence. Every chunk is checked to match the document text
+at its offsets.
+"""
+import random
+import sys
+import time
+
+from chunking import Chunker
+
+
+def get_chunks(text, chunk_length=500):
+    # The old chunker, verbatim
+    chunks = []
+    while len(text) > chunk_length:
+        last_period_index = text[:chunk_length].rfind('.')
+        if last_period_index == -1:
+            last_period_index = chunk_length
+        chunks.append(text[:last_period_index])
+        text = text[last_period_index+1:]
+    chunks.append(text)
+    return chunks
+
+
+def synthetic_pages(count, seed=0):
+    words = ("rate tariff utility commission staff request response exhibit testimony customer revenue "
+             "depreciation capital service territory filing order hearing intervenor settlement").split()
+    rng = random.Random(seed)
+    pages = []
+    for page in range(count):
+        sentences = []
+        for _ in range(30):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 18)))
+            sentences.append(sentence.capitalize() + rng.choice((".", ".", ".", "?", ";")))
+        pages.append(f"Case No. 2016-00371, page {page + 1}. " + " ".join(sentences))
+    return pages
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    page_counts = [int(value) for value in sys.argv[1:]] or [125, 250, 500, 1000]
+    chunkers = {
+        "char (500, overlap 50)": Chunker(500, 50, "char"),
+        "sentence (8, overlap 1)": Chunker(8, 1, "sentence"),
+        "token (500, overlap 100)": Chunker(500, 100, "token"),
+    }
+    print(f"{'pages':>6} {'MB':>5}  {'method':<26} {'chunks':>7} {'seconds':>8} {'us/page':>8}")
+    for count in page_counts:
+        pages = synthetic_pages(count)
+        text = "\n".join(pages)
+        megabytes = len(text) / 1e6
+
+        chunks, elapsed = timed(lambda: get_chunks(text))
+        print(f"{count:>6} {megabytes:>5.1f}  {'get_chunks (old)':<26} {len(chunks):>7} {elapsed:>8.3f} "
+              f"{elapsed / count * 1e6:>8.0f}")
+        for name, chunker in chunkers.items():
+            chunks, elapsed = timed(lambda: list(chunker.chunk_pages(pages)))
+            assert all(text[chunk.start:chunk.end] == chunk.text for chunk in chunks), name
+            print(f"{count:>6} {megabytes:>5.1f}  {name:<26} {len(chunks):>7} {elapsed:>8.3f} "
+                  f"{elapsed / count * 1e6:>8.0f}")
+
+        unpunctuated = [page.translate(str.maketrans("", "", ".?")) for page in pages]
+        sentence = chunkers["sentence (8, overlap 1)"]
+        chunks, elapsed = timed(lambda: list(sentence.chunk_pages(unpunctuated)))
+        assert max(len(chunk.text) for chunk in chunks) <= sentence.size * sentence.max_sentence
+        print(f"{count:>6} {megabytes:>5.1f}  {'sentence, no punctuation':<26} {len(chunks):>7} {elapsed:>8.3f} "
+              f"{elapsed / count * 1e6:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark embedding_client against one request per chunk, as the indexers send them.
+
+Usage: python bench_embeddings.py [chunks] [--latency 0.05] [--error-rate 0.02] [--dimensions 64]
+
+Both paths run against the local stub in embedding_stub.py. The stub adds latency per request
+and per input, and throttles a share of requests. Every chunk ID is checked to get the same
+vector from both paths before chunks per second are reported.
+"""
+import argparse
+import logging
+import time
+
+from embedding_client import EmbeddingClient, http_backend
+from embedding_stub import StubEmbeddingServer
+
+
+def serial(url, chunks):
+    # The old create_embeddings loop: one input per request, no retries
+    embed_batch = http_backend(url)
+    return {chunk_id: embed_batch([text])[0] for chunk_id, text in chunks}
+
+
+def batched(url, chunks, **kwargs):
+    # No cache, so every chunk is requested
+    client = EmbeddingClient(http_backend(url), backoff=0.05, cache=False, **kwargs)
+    return {embedding.id: embedding.vector for embedding in client.embed(chunks)}, client.stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("chunks", nargs="?", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-input-latency", type=float, default=0.0002)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    # Small vectors keep the stub's own CPU time out of the measurement
+    parser.add_argument("--dimensions", type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    chunks = [
+        (("2016-00371/Doc_%d.pdf" % (i // 20), i % 20),
+         f"Response to Staff's Request {i}: the utility proposes revised tariffs and rate design for case "
+         f"2016-00371, with exhibits {i} through {i + 3}. " * 3)
+        for i in range(args.chunks)
+    ]
+    # The serial baseline only talks to a server that never throttles, since it cannot retry
+    options = dict(dimensions=args.dimensions, latency=args.latency, per_input_latency=args.per_input_latency)
+    baseline_server = StubEmbeddingServer(("127.0.0.1", 0), **options).start()
+    server = StubEmbeddingServer(("127.0.0.1", 0), error_rate=args.error_rate, **options).start()
+    print(f"{len(chunks)} chunks, {args.latency * 1000:.0f} ms per request, "
+          f"{args.error_rate:.0%} of batched requests throttled")
+
+    sample = chunks[:200]
+    start = time.perf_counter()
+    expected = serial(baseline_server.url, sample)
+    baseline_rate = len(sample) / (time.perf_counter() - start)
+    print(f"one chunk per request: {baseline_rate:.0f} chunks/s (measured on {len(sample)} chunks)")
+
+    for batch_size, concurrency in ((16, 1), (256, 1), (256, 4)):
+        start = time.perf_counter()
+        vectors, stats = batched(server.url, chunks, max_batch_size=batch_size, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        same = len(vectors) == len(chunks) and all(vectors[chunk_id] == expected[chunk_id] for chunk_id, _ in sample)
+        print(f"batches of {batch_size}, {concurrency} in flight: {len(chunks) / elapsed:.0f} chunks/s "
+              f"({len(chunks) / elapsed / baseline_rate:.0f}x, {stats['requests']} requests, "
+              f"{stats['retries']} retries, {'same vectors' if same else 'VECTOR MISMATCH'})")
+
+    baseline_server.shutdown()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark JSONL streaming against the stream_jsonl loop debug_citation.py and reg_citation_metadata.py used.
+
+Usage: python bench_jsonl.py [--size-mb 1024] [--chunk-kb 4096] [--line-kb 32 262144]
+
+For each line size, a synthetic JSONL file of about size-mb of embedding records is written to a
+temporary directory and streamed in chunk-kb chunks (Azure's download chunk size is 4 MB). Line
+splitting alone and splitting plus decoding with each registered decoder are reported in MB/s,
+next to the old loop. Pass --size-mb 4096 or more for multi-GB blobs. The old loop re-decodes and
+re-splits its whole buffer for every chunk, so lines longer than a chunk slow it down
+quadratically. A multi-byte character split at every possible chunk boundary, in bytes and in
+memoryview chunks, checks that lines are decoded whole.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from jsonl_stream import _decoders, iter_lines, stream_jsonl
+
+
+def old_stream_jsonl(chunks):
+    # The old loop, verbatim
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode('utf-8')
+        lines = buffer.split('\n')
+        buffer = lines.pop()  # Keep incomplete line for next chunk
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_jsonl(path, size_mb, line_kb, seed=0):
+    """Write embedding records of about line_kb each until the file holds size_mb; return its size."""
+    rng = random.Random(seed)
+    dimensions = max(1, line_kb * 1024 // 21)  # json.dumps writes about 21 bytes per float
+    lines = []
+    for number in range(8):
+        record = {"id": f"filing_{number}", "filename": f"filing_{number}.pdf",
+                  "text": "Rate case testimony. " * 20,
+                  "embedding": [rng.uniform(-0.1, 0.1) for _ in range(dimensions)]}
+        lines.append(json.dumps(record).encode("utf-8") + b"\n")
+    written = 0
+    with open(path, "wb") as f:
+        while written < size_mb * 1e6:
+            line = lines[written % len(lines)]
+            f.write(line)
+            written += len(line)
+    return written
+
+
+def file_chunks(path, chunk_size):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+
+def check_split_characters():
+    record = {"text": "§ 807 KAR 5:001 — café"}
+    data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") * 3
+    for cut in range(1, len(data)):
+        assert list(stream_jsonl([data[:cut], data[cut:]], "json")) == [record] * 3
+        view = memoryview(bytearray(data))
+        assert list(stream_jsonl([view[:cut], view[cut:]], "json")) == [record] * 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--chunk-kb", type=int, default=4096)
+    parser.add_argument("--line-kb", type=int, nargs="+", default=[32, 262144])
+    args = parser.parse_args()
+    check_split_characters()
+
+    methods = {"iter_lines (split only)": lambda chunks: iter_lines(chunks)}
+    for name in _decoders:
+        methods[f"stream_jsonl ({name})"] = lambda chunks, name=name: stream_jsonl(chunks, name)
+    methods["old stream_jsonl"] = old_stream_jsonl
+
+    print(f"{'line KB':>8} {'MB':>6}  {'method':<26} {'lines':>7} {'seconds':>8} {'MB/s':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for line_kb in args.line_kb:
+            path = os.path.join(directory, f"embeddings_{line_kb}.jsonl")
+            megabytes = write_jsonl(path, args.size_mb, line_kb) / 1e6
+            for name, method in methods.items():
+                start = time.perf_counter()
+                count = sum(1 for _ in method(file_chunks(path, args.chunk_kb * 1024)))
+                elapsed = time.perf_counter() - start
+                print(f"{line_kb:>8} {megabytes:>6.0f}  {name:<26} {count:>7} {elapsed:>8.2f} "
+                      f"{megabytes / elapsed:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
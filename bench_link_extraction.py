@@ -0,0 +1,110 @@
+"""
+Benchmark link_extractor against the BeautifulSoup html.parser path used by the scrapers.
+
+Usage: python bench_link_extraction.py [saved_page.html ...]
+
+Without arguments a synthetic PSC-style case filings page is generated. Every page is checked
+for identical (href, name) results before timings are reported, after a set of markup edge cases
+(self-closing anchors, CDATA, comments, scripts, nesting, anchors closed by an enclosing element)
+has been checked the same way.
+"""
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from link_extractor import DOCUMENT_LINK_PATTERN, find_document_links
+
+EDGE_CASES = [
+    '<a href="x.pdf"/>after text<p>more</p>',
+    '<a href="x.pdf" />after</a>',
+    "<a href='x.pdf'/>after",
+    '<a href=x.pdf/>after</a>',
+    '<a href="x.pdf" / >after</a>',
+    '<a href="a.pdf">one<a href="b.pdf"/>two</a>three',
+    '<a href="a.pdf">outer <a href="b.pdf">inner</a> tail</a>',
+    '<![CDATA[<a href="c.pdf">cdata</a>]]><a href="d.pdf">d</a>',
+    '<a href="e.pdf">x<![CDATA[ <b>y</b> &amp; ]]>z</a>',
+    '<a href="e.pdf">x<![CDATA[ y ]> z</a>',
+    '<a href="f.pdf">x<!-- <a href="g.pdf">c</a> -->z</a>',
+    '<script>var a = \'<a href="s.pdf">s</a>\';</script><a href="t.pdf">t</a>',
+    '<A HREF="H.PDF" href="h.pdf">Upper &amp; lower &lt;</A>',
+    '<a href="i.docx"><span>Response</span><br/>  Exhibits </a>',
+    '<a href="j.xlsx">unterminated',
+    '<div><a href="k.pdf">x</div>y</a>',
+    '<table><tr><td><a href="k.pdf">x</table>y</a>',
+    '<td><a href="k.pdf">x</TD ><td>y</td>',
+    '<div><a href="k.pdf">x<div/>y</div>z</a>',
+    '<b><a href="k.pdf">x<b>y</b>z</b>w</a>',
+    '<p><a href="k.pdf">x<p>y</span>z<br>w</br>v</a>',
+]
+
+
+def soup_links(html, pattern):
+    soup = BeautifulSoup(html, 'html.parser')
+    document_links = soup.find_all('a', href=re.compile(pattern))
+    return [(link['href'], link.text.strip() or link['href'].split('/')[-1]) for link in document_links]
+
+
+def fast_links(html, pattern):
+    return [(link.href, link.text or link.href.split('/')[-1]) for link in find_document_links(html, pattern)]
+
+
+def check_edge_cases():
+    for html in EDGE_CASES:
+        expected = soup_links(html, DOCUMENT_LINK_PATTERN)
+        actual = fast_links(html, DOCUMENT_LINK_PATTERN)
+        assert expected == actual, f"{html!r}: BeautifulSoup {expected}, link_extractor {actual}"
+
+
+def synthetic_page(filings=2000):
+    rows = []
+    for i in range(filings):
+        extension = ("pdf", "docx", "txt", "xls", "xlsx", "html")[i % 6]
+        rows.append(
+            f'<tr class="filing"><td>{i:05d}</td><td>03/{i % 28 + 1:02d}/2016</td>'
+            f'<td><a href="/pscecf/2016-00371/filing&amp;id={i}/Doc_{i}.{extension}" title="Filing {i}">'
+            f'<span>Response to Staff&#39;s Request {i}</span> &amp; Exhibits</a></td>'
+            f'<td><a href="/Case/ViewCaseFilings/2016-00371#{i}">Details</a></td></tr>'
+        )
+    return (
+        "<html><head><title>Case 2016-00371</title><script>var x = '<a href=\"no.pdf\">';</script></head>"
+        "<body><!-- <a href=\"commented.pdf\">hidden</a> --><table>" + "\n".join(rows) + "</table></body></html>"
+    )
+
+
+def best_of(function, html, pattern, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(html, pattern)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    check_edge_cases()
+    pages = [(path, open(path, encoding="utf-8", errors="replace").read()) for path in sys.argv[1:]]
+    if not pages:
+        pages = [("synthetic", synthetic_page())]
+
+    for name, html in pages:
+        expected = soup_links(html, DOCUMENT_LINK_PATTERN)
+        actual = fast_links(html, DOCUMENT_LINK_PATTERN)
+        if expected != actual:
+            mismatches = [(e, a) for e, a in zip(expected, actual) if e != a][:5]
+            print(f"{name}: MISMATCH ({len(expected)} vs {len(actual)} links) first differences: {mismatches}")
+            continue
+
+        soup_time = best_of(soup_links, html, DOCUMENT_LINK_PATTERN)
+        fast_time = best_of(fast_links, html, DOCUMENT_LINK_PATTERN)
+        print(
+            f"{name}: {len(html) / 1e6:.2f} MB, {len(actual)} links, "
+            f"BeautifulSoup {soup_time * 1000:.1f} ms, link_extractor {fast_time * 1000:.1f} ms "
+            f"({soup_time / fast_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark pdf_extract against the serial PyPDF loops used by the indexers.
+
+Usage: python bench_pdf_extract.py [pdf_directory]
+
+Without a directory a synthetic corpus of filings is generated in memory. The baseline is the
+old Indexer.py loop (extract_text() called twice per page, one document at a time); the engine
+result is checked to produce the same text before pages per second are reported.
+"""
+import io
+import os
+import sys
+import time
+
+from pdf_extract import PdfExtractor, PdfReader, page_count
+
+
+def synthetic_pdf(pages, lines_per_page=40):
+    """Build a simple text PDF with Helvetica pages, enough for PyPDF to extract."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [f"Response to Staff's Request {page}-{line}: rates, tariffs and exhibits for case 2016-00371."
+                 for line in range(lines_per_page)]
+        content = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(f"({text}) '" for text in lines) + " ET"
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream".encode())
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>".encode()
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def baseline(documents):
+    texts = []
+    for name, data in documents:
+        reader = PdfReader(io.BytesIO(data))
+        text = "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
+        texts.append((name, text))
+    return texts
+
+
+def engine(documents, **kwargs):
+    with PdfExtractor(**kwargs) as extractor:
+        return [(result.name, result.text("\n")) for result in extractor.extract(documents)]
+
+
+def main():
+    if len(sys.argv) > 1:
+        directory = sys.argv[1]
+        documents = []
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.lower().endswith(".pdf"):
+                with open(os.path.join(directory, file_name), "rb") as f:
+                    documents.append((file_name, f.read()))
+    else:
+        # Mostly short filings plus a few long exhibits, like a typical docket
+        documents = [(f"filing_{i}.pdf", synthetic_pdf(3 + i % 5)) for i in range(60)]
+        documents += [(f"exhibit_{i}.pdf", synthetic_pdf(150)) for i in range(2)]
+
+    pages = sum(page_count(data) for _, data in documents)
+    print(f"{len(documents)} documents, {pages} pages, {sum(len(d) for _, d in documents) / 1e6:.1f} MB, "
+          f"{os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    expected = baseline(documents)
+    baseline_time = time.perf_counter() - start
+    print(f"serial baseline: {baseline_time:.2f}s, {pages / baseline_time:.0f} pages/s")
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        actual = engine(documents, workers=workers, split_bytes=256 * 1024)
+        elapsed = time.perf_counter() - start
+        status = "same text" if actual == expected else "TEXT MISMATCH"
+        print(f"pdf_extract, {workers} workers: {elapsed:.2f}s, {pages / elapsed:.0f} pages/s "
+              f"({baseline_time / elapsed:.1f}x, {status})")
+
+
+if __name__ == "__main__":
+    main()
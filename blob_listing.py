@@ -0,0 +1,176 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.storage.blob import BlobPrefix
+
+# Listing configuration
+LISTING_PREFIX_DEPTH = int(os.getenv("LISTING_PREFIX_DEPTH", "2"))  # Prefix levels walked first: <year>/<case_number>/
+LISTING_CONCURRENCY = int(os.getenv("LISTING_CONCURRENCY", "8"))  # Prefixes listed in parallel
+LISTING_SNAPSHOT_DIR = os.getenv("LISTING_SNAPSHOT_DIR", "crawl_state/listings")  # Where listing snapshots are kept
+
+ListingDiff = namedtuple("ListingDiff", ["added", "changed", "removed"])
+
+_TASK_DONE = object()
+
+
+def _snapshot_entry(blob):
+    return {
+        "name": blob.name,
+        "etag": blob.etag,
+        "size": blob.size,
+        "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
+    }
+
+
+def snapshot_path(container_name):
+    """Return the snapshot file of a container."""
+    return os.path.join(LISTING_SNAPSHOT_DIR, f"{container_name}.jsonl")
+
+
+def load_snapshot(path):
+    """Load a listing snapshot as {blob name: entry}; empty when there is none yet."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {entry["name"]: entry for entry in map(json.loads, f) if entry}
+
+
+def save_snapshot(path, entries):
+    """Atomically write a snapshot of {blob name: entry}."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        for name in sorted(entries):
+            f.write(json.dumps(entries[name]) + "\n")
+    os.replace(temporary, path)
+
+
+def diff_snapshots(previous, current):
+    """
+    Compares two snapshots.
+
+    :return: ListingDiff of added, changed (different ETag) and removed blob names, each sorted.
+    """
+    added = sorted(name for name in current if name not in previous)
+    changed = sorted(name for name, entry in current.items()
+                     if name in previous and previous[name]["etag"] != entry["etag"])
+    removed = sorted(name for name in previous if name not in current)
+    return ListingDiff(added, changed, removed)
+
+
+def iter_blobs(container_client, suffixes=None, depth=None, concurrency=None, snapshot=False):
+    """
+    Lists a container by walking its prefixes in parallel and yields blobs as soon as they arrive.
+
+    The first depth levels of "/"-delimited prefixes (<year>/<case_number>/ by default) are
+    discovered with walk_blobs and every prefix at that depth is listed flat on a thread pool,
+    so processing starts with the first page of the first case instead of after a serial
+    listing of the whole container. Blobs arrive in no particular order.
+
+    With snapshot set, a listing that runs to completion is saved for later runs to diff against.
+    Only the one full listing a run makes should set it: every snapshot replaces the baseline
+    the next diff compares with.
+
+    :param container_client: Azure container client to list.
+    :param suffixes: Optional name suffix or tuple of suffixes to keep, e.g. ".pdf".
+    :param depth: Prefix levels to walk before listing flat (default LISTING_PREFIX_DEPTH).
+    :param concurrency: Prefixes listed in parallel (default LISTING_CONCURRENCY).
+    :param snapshot: Save a snapshot of the full listing (True), write it to this path, or
+                     save none (False, the default).
+    :yield: BlobProperties of each blob.
+    """
+    depth = LISTING_PREFIX_DEPTH if depth is None else depth
+    concurrency = concurrency or LISTING_CONCURRENCY
+    results = queue.Queue()
+    stop = threading.Event()
+    outstanding = [0]
+    lock = threading.Lock()
+
+    def submit(executor, prefix, level):
+        with lock:
+            outstanding[0] += 1
+        executor.submit(enumerate_prefix, executor, prefix, level)
+
+    def enumerate_prefix(executor, prefix, level):
+        try:
+            if level < depth:
+                items = container_client.walk_blobs(name_starts_with=prefix, delimiter="/")
+            else:
+                items = container_client.list_blobs(name_starts_with=prefix)
+            for item in items:
+                if stop.is_set():
+                    break
+                if isinstance(item, BlobPrefix):
+                    submit(executor, item.name, level + 1)
+                else:
+                    results.put(item)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(_TASK_DONE)
+
+    path = (snapshot_path(container_client.container_name) if snapshot is True else snapshot) or None
+    entries = {}
+    completed = False
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="blob-listing")
+    try:
+        submit(executor, None, 0)
+        while True:
+            item = results.get()
+            if item is _TASK_DONE:
+                with lock:
+                    outstanding[0] -= 1
+                    if not outstanding[0]:
+                        break
+                continue
+            if isinstance(item, Exception):
+                raise item
+            if item.name.endswith("/"):
+                # Legacy zero-byte folder markers
+                continue
+            if path:
+                entries[item.name] = _snapshot_entry(item)
+            if suffixes is None or item.name.endswith(suffixes):
+                yield item
+        completed = True
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+    if completed and path:
+        save_snapshot(path, entries)
+
+
+def diff_listing(container_client, **kwargs):
+    """List a container, save its new snapshot and return what changed since the previous one."""
+    path = kwargs.pop("snapshot", None) or snapshot_path(container_client.container_name)
+    previous = load_snapshot(path)
+    for _ in iter_blobs(container_client, snapshot=path, **kwargs):
+        pass
+    return diff_snapshots(previous, load_snapshot(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List a container in parallel and diff it against the last run.")
+    parser.add_argument("container")
+    parser.add_argument("--connection-string", default=os.getenv("AZURE_STORAGE_CONNECTION_STRING"))
+    args = parser.parse_args()
+
+    from azure.storage.blob import BlobServiceClient
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    service = BlobServiceClient.from_connection_string(args.connection_string)
+    diff = diff_listing(service.get_container_client(args.container))
+    logging.info(f"{args.container}: {len(diff.added)} added, {len(diff.changed)} changed, {len(diff.removed)} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobBlock
+
+import http_client
+import manifest
+from manifest import DIGEST_METADATA_KEY, REFERENCE_METADATA_KEY, blob_metadata
+
+# Streaming upload configuration
+STREAM_BLOCK_SIZE = int(os.getenv("STREAM_BLOCK_SIZE", str(4 * 1024 * 1024)))  # Bytes per staged block
+STREAM_UPLOAD_CONCURRENCY = int(os.getenv("STREAM_UPLOAD_CONCURRENCY", "4"))  # Blocks staged in parallel per transfer
+
+# Content dedupe configuration: "off", "skip" (identical bytes already at the path) or
+# "reference" (also store bytes seen under another path as a reference blob)
+DEDUPE_MODE = os.getenv("DEDUPE_MODE", "skip")
+DEDUPE_SPOOL_SIZE = int(os.getenv("DEDUPE_SPOOL_SIZE", str(STREAM_BLOCK_SIZE)))  # Bytes kept in memory while hashing
+
+
+def _blocks(chunks, block_size):
+    """Re-slice an iterable of byte chunks into blocks of exactly block_size bytes (last one may be shorter)."""
+    buffer = bytearray()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _block_id(index):
+    # Block IDs must all have the same length within a blob
+    return base64.b64encode(f"{index:08d}".encode()).decode()
+
+
+def stream_to_blob(chunks, blob_client, block_size=None, max_concurrency=None, metadata=None):
+    """
+    Uploads an iterable of byte chunks to a block blob without buffering the whole document.
+
+    Chunks are re-sliced into fixed-size blocks that are staged in parallel and committed once
+    the source is exhausted, so at most max_concurrency + 1 blocks are held in memory at a time.
+    Documents that fit in a single block are uploaded with one put call.
+
+    :param chunks: Iterable of bytes, e.g. response.iter_content(block_size).
+    :param blob_client: Azure BlobClient to write to (overwritten on commit).
+    :param block_size: Bytes per staged block.
+    :param max_concurrency: Maximum blocks staged in parallel.
+    :param metadata: Optional blob metadata set on commit, which happens after chunks are exhausted.
+    :return: (total number of bytes uploaded, ETag of the written blob).
+    """
+    block_size = block_size or STREAM_BLOCK_SIZE
+    max_concurrency = max_concurrency or STREAM_UPLOAD_CONCURRENCY
+    blocks = _blocks(chunks, block_size)
+
+    first = next(blocks, b"")
+    second = next(blocks, None)
+    if second is None:
+        written = blob_client.upload_blob(first, overwrite=True, metadata=metadata)
+        return len(first), written.get("etag")
+
+    in_flight = threading.BoundedSemaphore(max_concurrency)
+    block_list = []
+    futures = []
+    total = 0
+
+    def stage(block_id, data):
+        try:
+            blob_client.stage_block(block_id=block_id, data=data)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for index, data in enumerate(chain([first, second], blocks)):
+            in_flight.acquire()
+            block_id = _block_id(index)
+            block_list.append(BlobBlock(block_id=block_id))
+            futures.append(executor.submit(stage, block_id, data))
+            total += len(data)
+            # Surface staging failures early instead of reading the rest of the source
+            for future in [f for f in futures if f.done()]:
+                future.result()
+                futures.remove(future)
+        for future in futures:
+            future.result()
+
+    written = blob_client.commit_block_list(block_list, metadata=metadata)
+    return total, written.get("etag")
+
+
+def hashed_chunks(chunks, digest):
+    """Pass byte chunks through while feeding them to a hashlib digest."""
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def _digest_into(chunks, digest, metadata):
+    """Pass byte chunks through a digest, then store the digest in metadata once they are exhausted."""
+    yield from hashed_chunks(chunks, digest)
+    metadata[DIGEST_METADATA_KEY] = digest.hexdigest()
+
+
+def transfer_document(document_url, blob_client, block_size=None, max_concurrency=None, dedupe=None):
+    """
+    Streams a document from its URL into Azure Blob Storage, skipping bytes that are already stored.
+
+    Documents the manifest already records at this path for the same URL are skipped before any
+    download. With dedupe enabled, a path that has no recorded SHA-256 (in the manifest or the
+    blob's metadata) is streamed straight into staged blocks while it is hashed, and the digest is
+    set on commit. Only when there is a digest to compare with is the download hashed into a
+    spooled buffer first, so an unchanged blob is never rewritten. In "reference" mode, where any
+    path may already hold the bytes, every download is spooled and bytes stored under another
+    path are written as an empty blob whose metadata points at that path. Every write is recorded
+    in the manifest.
+
+    :param document_url: URL of the document.
+    :param blob_client: Azure BlobClient to write to.
+    :param dedupe: Dedupe mode ("off", "skip" or "reference"), default DEDUPE_MODE.
+    :return: "skipped", "uploaded", "unchanged" or "referenced".
+    """
+    block_size = block_size or STREAM_BLOCK_SIZE
+    dedupe = dedupe or DEDUPE_MODE
+    documents = manifest.get_manifest()
+    container, blob_path = blob_client.container_name, blob_client.blob_name
+    if manifest.MANIFEST_SKIP_KNOWN and documents.is_stored(container, blob_path, document_url):
+        return "skipped"
+
+    previous = None
+    stored = None
+    if dedupe != "off":
+        previous = documents.digest_of(container, blob_path)
+        if previous is None:
+            try:
+                stored = blob_client.get_blob_properties()
+            except ResourceNotFoundError:
+                stored = None
+            previous = (stored.metadata or {}).get(DIGEST_METADATA_KEY) if stored is not None else None
+
+    metadata = blob_metadata(document_url)
+    digest = hashlib.sha256()
+    with http_client.get(document_url, stream=True) as response:
+        response.raise_for_status()
+        if dedupe == "off" or (dedupe == "skip" and previous is None):
+            chunks = response.iter_content(block_size)
+            # stream_to_blob exhausts the chunks before it commits, so the digest is in the metadata by then;
+            # with dedupe off it goes to the manifest alone
+            chunks = hashed_chunks(chunks, digest) if dedupe == "off" else _digest_into(chunks, digest, metadata)
+            size, etag = stream_to_blob(chunks, blob_client, block_size, max_concurrency, metadata)
+            documents.record(container, blob_path, document_url, size, digest.hexdigest(), etag)
+            return "uploaded"
+
+        spool = SpooledTemporaryFile(max_size=DEDUPE_SPOOL_SIZE)
+        for chunk in response.iter_content(block_size):
+            digest.update(chunk)
+            spool.write(chunk)
+
+    with spool:
+        def write(metadata):
+            spool.seek(0)
+            chunks = iter(lambda: spool.read(block_size), b"")
+            return stream_to_blob(chunks, blob_client, block_size, max_concurrency, metadata)[1]
+
+        return store_digested(blob_client, document_url, spool.tell(), digest.hexdigest(), write, dedupe, stored)
+
+
+def store_digested(blob_client, document_url, size, sha256, write, dedupe=None, stored=None):
+    """
+    Writes a downloaded document whose SHA-256 is known, unless the same bytes are already stored.
+
+    The digest is compared with the manifest and the target blob's metadata; in "reference" mode,
+    bytes already stored under another path are written as an empty reference blob instead.
+
+    :param size: Document size in bytes.
+    :param write: Function taking the blob metadata, writing the document's bytes and returning the ETag.
+    :param dedupe: Dedupe mode ("off", "skip" or "reference"), default DEDUPE_MODE.
+    :param stored: The target blob's properties, when already fetched.
+    :return: "uploaded", "unchanged" or "referenced".
+    """
+    dedupe = dedupe or DEDUPE_MODE
+    documents = manifest.get_manifest()
+    container, blob_path = blob_client.container_name, blob_client.blob_name
+    metadata = blob_metadata(document_url, sha256)
+    if dedupe != "off":
+        if documents.digest_of(container, blob_path) == sha256:
+            return "unchanged"
+        if stored is None:
+            try:
+                stored = blob_client.get_blob_properties()
+            except ResourceNotFoundError:
+                stored = None
+        if stored is not None and (stored.metadata or {}).get(DIGEST_METADATA_KEY) == sha256:
+            documents.record(container, blob_path, document_url, size, sha256, stored.etag,
+                             reference=REFERENCE_METADATA_KEY in stored.metadata)
+            return "unchanged"
+
+    canonical = documents.find(container, sha256) if dedupe == "reference" else None
+    if canonical and canonical != blob_path:
+        metadata[REFERENCE_METADATA_KEY] = canonical
+        written = blob_client.upload_blob(b"", overwrite=True, metadata=metadata)
+        documents.record(container, blob_path, document_url, size, sha256, written.get("etag"), reference=True)
+        return "referenced"
+
+    etag = write(metadata)
+    documents.record(container, blob_path, document_url, size, sha256, etag)
+    return "uploaded"
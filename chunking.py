@@ -0,0 +1,228 @@
+import os
+import re
+from bisect import bisect_right
+from collections import deque, namedtuple
+
+# Chunking configuration
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "char")  # "char", "sentence" or "token"
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))  # Characters, sentences or tokens per chunk
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "0"))  # Characters, sentences or tokens repeated from the last chunk
+CHUNK_MAX_SENTENCE = int(os.getenv("CHUNK_MAX_SENTENCE", "1000"))  # Longest sentence in characters, in sentence mode
+
+# start and end are offsets into the document text (the pages joined with the separator);
+# page is the number of the page the chunk starts on, counting from 0
+Chunk = namedtuple("Chunk", ["text", "start", "end", "page"])
+
+_WORD = re.compile(r"\S+")
+_SPACE = re.compile(r"\s+")
+_NON_SPACE = re.compile(r"\S")
+# A sentence runs to terminal punctuation followed by whitespace, or to the end of the text
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s)")
+
+UNITS = ("char", "sentence", "token")
+
+
+class Chunker:
+    """
+    Splits text into overlapping chunks in a single pass, working from offsets into the text.
+
+    Sizes are counted in the chosen unit:
+    - char: chunks of up to size characters, cut after the last sentence in the chunk's second
+      half, else between words
+    - sentence: chunks of up to size whole sentences; a sentence longer than max_sentence
+      characters (e.g. text without punctuation) is cut between words
+    - token: chunks of up to size tokens, cut between words; tokens are counted with tiktoken
+      when it is installed
+
+    Pages are consumed as a stream and only the text of the chunk being built is buffered, so
+    work and memory do not grow with the length of the document.
+    """
+
+    def __init__(self, size=None, overlap=None, unit=None, tokenizer=None, max_sentence=None):
+        self.size = size or CHUNK_SIZE
+        self.max_sentence = max_sentence or CHUNK_MAX_SENTENCE
+        self.overlap = CHUNK_OVERLAP if overlap is None else overlap
+        self.unit = unit or CHUNK_UNIT
+        if self.unit not in UNITS:
+            raise ValueError(f"Unsupported chunk unit: {self.unit}")
+        if not 0 <= self.overlap < self.size:
+            raise ValueError("Chunk overlap must be at least 0 and smaller than the chunk size")
+        self._token_counts = {}
+        if self.unit == "token" and tokenizer is None:
+            from embedding_client import Tokenizer
+
+            tokenizer = Tokenizer()
+        self.tokenizer = tokenizer
+
+    def _weight(self, word):
+        # Words recur constantly, so their token counts are memoized
+        count = self._token_counts.get(word)
+        if count is None:
+            count = self._token_counts[word] = self.tokenizer.count(" " + word)
+        return count
+
+    @staticmethod
+    def _sentence_end(buffer, low, high):
+        """Return the offset just past the last sentence-ending punctuation in buffer[low:high], or -1."""
+        best = -1
+        for terminator in ".?!":
+            position = buffer.rfind(terminator, low, high)
+            # Punctuation inside a token, e.g. "2016.00371", does not end a sentence
+            while position != -1 and not buffer[position + 1].isspace():
+                position = buffer.rfind(terminator, low, position)
+            best = max(best, position)
+        return best + 1 if best != -1 else -1
+
+    def _cut(self, buffer, start, limit):
+        """Return where a char chunk from start should end, given it may run to limit."""
+        end = self._sentence_end(buffer, start + self.size // 2, limit)
+        if end != -1:
+            return end
+        if buffer[limit].isspace():
+            return limit
+        position = max(buffer.rfind(" ", start, limit), buffer.rfind("\n", start, limit))
+        # A run without whitespace longer than a chunk is cut mid-word
+        return position if position > start else limit
+
+    def _char_spans(self, buffer, position, final):
+        """Yield (start, end, next position) of char chunks in buffer; stop where more text is needed."""
+        while True:
+            match = _NON_SPACE.search(buffer, position)
+            if match is None:
+                return
+            start = match.start()
+            limit = start + self.size
+            if limit >= len(buffer):
+                if final:
+                    yield start, len(buffer.rstrip()), len(buffer)
+                return
+            end = self._cut(buffer, start, limit)
+            while buffer[end - 1].isspace():
+                end -= 1
+            position = end
+            if self.overlap:
+                # Step back into the chunk, then forward to the next word
+                position = max(end - self.overlap, start + 1)
+                if not buffer[position - 1].isspace():
+                    space = _SPACE.search(buffer, position, end)
+                    position = space.end() if space else end
+            yield start, end, position
+
+    def _sentence_spans(self, buffer, position, final):
+        """Yield (start, end) of the sentences in buffer, holding back one that may continue."""
+        while True:
+            match = _NON_SPACE.search(buffer, position)
+            if match is None:
+                return
+            start = match.start()
+            # Looking no further than max_sentence keeps the held-back sentence from being rescanned per page
+            limit = start + self.max_sentence
+            terminator = _SENTENCE_END.search(buffer, start, min(limit, len(buffer)))
+            if terminator is not None:
+                end = terminator.end()
+            elif limit < len(buffer):
+                end = limit if buffer[limit].isspace() else max(buffer.rfind(" ", start, limit),
+                                                                 buffer.rfind("\n", start, limit))
+                # A run without whitespace longer than a sentence is cut mid-word
+                if end <= start:
+                    end = limit
+                while buffer[end - 1].isspace():
+                    end -= 1
+            elif final:
+                end = len(buffer.rstrip())
+            else:
+                return
+            yield start, end
+            position = end
+
+    def _units(self, buffer, base, position, final):
+        """Yield (start, end, weight) of the sentences or words in buffer, holding back one that may continue."""
+        if self.unit == "sentence":
+            for start, end in self._sentence_spans(buffer, position, final):
+                yield base + start, base + end, 1
+            return
+        for match in _WORD.finditer(buffer, position):
+            start, end = match.span()
+            if end == len(buffer) and not final:
+                return
+            weight = self._weight(match.group()) if self.unit == "token" else 1
+            yield base + start, base + end, weight
+
+    def chunk_pages(self, pages, separator="\n"):
+        """
+        Chunks a document given as a stream of page texts.
+
+        :param pages: Iterable of page strings, e.g. an extractor's pages in order.
+        :param separator: Text between pages; offsets count it.
+        :yield: Chunk(text, start, end, page) in document order.
+        """
+        buffer = ""  # Document text from offset base onwards
+        base = 0
+        scanned = 0  # Buffer position from which text has not been consumed yet
+        page_starts = []
+        # Sentence and token chunks are built from a window of units: (start, end, weight)
+        window = deque()
+        weight = 0
+        emitted_end = 0
+
+        def chunk(start, end):
+            page = bisect_right(page_starts, start) - 1
+            return Chunk(buffer[start - base:end - base], start, end, page)
+
+        def add(unit):
+            nonlocal weight, emitted_end
+            unit_weight = unit[2]
+            if window and weight + unit_weight > self.size:
+                emitted_end = window[-1][1]
+                yield chunk(window[0][0], emitted_end)
+                # Keep the last units that fit in the overlap, and leave room for the new unit
+                while window and (weight > self.overlap or weight + unit_weight > self.size):
+                    weight -= window.popleft()[2]
+            window.append(unit)
+            weight += unit_weight
+
+        def consume(final):
+            nonlocal scanned
+            if self.unit == "char":
+                for start, end, position in self._char_spans(buffer, scanned, final):
+                    scanned = position
+                    yield chunk(base + start, base + end)
+            else:
+                for unit in self._units(buffer, base, scanned, final):
+                    scanned = unit[1] - base
+                    yield from add(unit)
+
+        offset = 0
+        for number, page in enumerate(pages):
+            if number:
+                buffer += separator
+                offset += len(separator)
+            page_starts.append(offset)
+            buffer += page
+            offset += len(page)
+            yield from consume(final=False)
+            # Drop consumed text once it is most of the buffer
+            keep = min(window[0][0] - base, scanned) if window else scanned
+            if keep > len(buffer) // 2:
+                buffer = buffer[keep:]
+                base += keep
+                scanned -= keep
+
+        yield from consume(final=True)
+        # Units after the last emitted chunk form the final one
+        if window and window[-1][1] > emitted_end:
+            yield chunk(window[0][0], window[-1][1])
+
+    def chunk_text(self, text):
+        """Chunk a single text; return a list of Chunks."""
+        return list(self.chunk_pages([text]))
+
+
+def chunk_text(text, size=None, overlap=None, unit=None):
+    """Chunk a text; return a list of Chunk(text, start, end, page)."""
+    return Chunker(size, overlap, unit).chunk_text(text)
+
+
+def chunk_pages(pages, size=None, overlap=None, unit=None, separator="\n"):
+    """Chunk a stream of page texts; yield Chunk(text, start, end, page)."""
+    return Chunker(size, overlap, unit).chunk_pages(pages, separator)
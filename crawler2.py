@@ -1,8 +1,10 @@
 import os
 import re
 import requests
-from bs4 import BeautifulSoup
+import http_client
+from link_extractor import find_document_links
 from azure.storage.blob import BlobServiceClient
+from async_fetcher import fetch_documents
 
 # Azure Blob Storage configuration
 AZURE_CONNECTION_STRING = "<AZURE_CONNECTION_STRING>"  # Replace with your Azure connection string
@@ -22,20 +24,6 @@ def get_case_number_from_url(url):
     match = re.search(r"(\d{4}-\d{5})", url)
     return match.group(1) if match else "unknown_case"
 
-def download_and_upload_document(document_url, year, case_number, document_name):
-    """Download a document and upload it to Azure Blob Storage."""
-    try:
-        # Download the document
-        response = requests.get(document_url, stream=True)
-        response.raise_for_status()
-
-        # Create folder structure: <Year>/<CaseNumber>/<DocumentName>
-        blob_client = container_client.get_blob_client(blob=f"{year}/{case_number}/{document_name}")
-        blob_client.upload_blob(response.content, overwrite=True)
-        print(f"Uploaded {document_name} to {year}/{case_number} in Azure Blob Storage.")
-    except Exception as e:
-        print(f"Failed to process {document_url}: {e}")
-
 def scrape_case_documents(url):
     """Scrape the webpage for document links and upload them."""
     year = get_year_from_url(url)
@@ -43,22 +31,25 @@ def scrape_case_documents(url):
     
     try:
         # Fetch the webpage content
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
 
-        # Parse the webpage
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find all links with .pdf or .docx (or any other document types you want)
-        document_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx|txt|xls)$'))
+        # Find all document links in a single pass over the page
+        document_links = find_document_links(response.text, r'\.(pdf|docx|txt|xls)$')
 
+        documents = []
         for link in document_links:
-            document_url = link['href']
-            document_name = link.text.strip() or document_url.split('/')[-1]
+            document_url = link.href
+            document_name = link.text or document_url.split('/')[-1]
             full_document_url = requests.compat.urljoin(url, document_url)
+            documents.append({"document_url": full_document_url, "path": f"{year}/{case_number}/{document_name}"})
 
-            # Download and upload each document
-            download_and_upload_document(full_document_url, year, case_number, document_name)
+        # Download and upload the documents concurrently
+        for result in fetch_documents(container_client, documents):
+            if result["status"] == "error":
+                print(f"Failed to process {result['document_url']}: {result['error']}")
+            else:
+                print(f"{result['status'].capitalize()} {result['path']} in Azure Blob Storage.")
     except Exception as e:
         print(f"Error while scraping {url}: {e}")
 
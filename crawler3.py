@@ -1,8 +1,10 @@
 import os
 import re
 import requests
-from bs4 import BeautifulSoup
+from link_extractor import find_document_links
 from azure.storage.blob import BlobServiceClient
+from async_fetcher import fetch_documents
+import validator_store
 
 # Azure Blob Storage configuration
 AZURE_CONNECTION_STRING = "<AZURE_CONNECTION_STRING>"  # Replace with your Azure connection string
@@ -17,48 +19,45 @@ def get_docket_number_from_url(url):
     match = re.search(r"docket/(\d+)", url)
     return match.group(1) if match else "unknown_docket"
 
-def download_and_upload_document(document_url, folder_name, document_name):
-    """Download a document and upload it to Azure Blob Storage."""
-    try:
-        # Download the document
-        response = requests.get(document_url, stream=True)
-        response.raise_for_status()
-
-        # Upload the document to Azure Blob Storage
-        blob_client = container_client.get_blob_client(blob=f"{folder_name}/{document_name}")
-        blob_client.upload_blob(response.content, overwrite=True)
-        print(f"Uploaded {document_name} to folder {folder_name} in Azure Blob Storage.")
-    except Exception as e:
-        print(f"Failed to process {document_url}: {e}")
-
 def scrape_documents(url):
     """Scrape the webpage for document links and upload them."""
     docket_number = get_docket_number_from_url(url)
     results = {"url": url, "docket_number": docket_number, "documents": []}
 
     try:
-        # Ensure the folder exists in the Azure container
+        # Blob paths under the docket act as its folder; the manifest tracks what is stored
         folder_name = docket_number
-        container_client.get_blob_client(blob=f"{folder_name}/").upload_blob(b"", overwrite=True)
 
-        # Fetch the webpage content
-        response = requests.get(url)
-        response.raise_for_status()
+        # Fetch the webpage content, revalidating it against the last run
+        page = validator_store.fetch_page(url)
+        if not page.changed:
+            print(f"Skipping {url}: unchanged since last run.")
+            results["skipped"] = True
+            return results
 
-        # Parse the webpage
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find all links with .pdf or .docx
-        document_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx)$'))
+        # Find all document links in a single pass over the page
+        document_links = find_document_links(page.response.text, r'\.(pdf|docx)$')
 
+        documents = []
         for link in document_links:
-            document_url = link['href']
-            document_name = link.text.strip() or document_url.split('/')[-1]
+            document_url = link.href
+            document_name = link.text or document_url.split('/')[-1]
             full_document_url = requests.compat.urljoin(url, document_url)
-
-            # Download and upload each document
-            download_and_upload_document(full_document_url, folder_name, document_name)
+            documents.append({"document_url": full_document_url, "path": f"{folder_name}/{document_name}"})
             results["documents"].append({"name": document_name, "url": full_document_url})
+
+        # Download and upload the documents concurrently
+        failed = 0
+        for result in fetch_documents(container_client, documents):
+            if result["status"] == "error":
+                failed += 1
+                print(f"Failed to process {result['document_url']}: {result['error']}")
+            else:
+                print(f"{result['status'].capitalize()} {result['path']} in Azure Blob Storage.")
+
+        # Only remember the page once every document made it, so failures are retried next run
+        if not failed:
+            validator_store.record_page(page)
     except Exception as e:
         print(f"Error while scraping {url}: {e}")
 
@@ -75,6 +74,7 @@ def main():
         print(f"Processing URL: {url}")
         result = scrape_documents(url)
         print(f"Finished processing {url}. Documents: {result['documents']}")
+    print(f"Pages: {validator_store.run_summary()}")
 
 if __name__ == "__main__":
     main()
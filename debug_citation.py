@@ -1,7 +1,7 @@
-import json
 import logging
 import os
 from azure.storage.blob import BlobServiceClient
+import jsonl_stream
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,15 +24,8 @@ def stream_jsonl(blob_client):
     :param blob_client: Azure Blob Storage client for the JSONL file.
     :yield: Each JSON object in the file.
     """
-    stream = blob_client.download_blob().chunks()
-    buffer = ""
-    for chunk in stream:
-        buffer += chunk.decode('utf-8')
-        lines = buffer.split('\n')
-        buffer = lines.pop()  # Keep incomplete line for next chunk
-        for line in lines:
-            if line.strip():
-                yield json.loads(line)
+    # Lines are split as bytes and decoded whole, so long embedding lines stay linear-time
+    yield from jsonl_stream.stream_jsonl(blob_client.download_blob().chunks())
 
 def load_citation_dict():
     """
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+# Embedding cache configuration
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 0 for no limit
+EMBEDDING_CACHE_EVICT_EVERY = 1000  # Stores between size checks
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Normalize a chunk for cache keys: Unicode NFKC with runs of whitespace collapsed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite cache of embedding vectors keyed by the hash of the normalized chunk text and the model.
+
+    Boilerplate that recurs across dockets (certificates of service, cover letters) is embedded
+    once. The database runs in WAL mode with a busy timeout, so several indexer processes can
+    share one cache file. Vectors are stored as float32. Once the vectors exceed max_bytes, the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, vector BLOB, size INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._stores = 0
+
+    def get_many(self, model, texts):
+        """Return {index: vector} for the texts found in the cache, marking them recently used."""
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite limits bound parameters per statement
+            for start in range(0, len(keys), 500):
+                part = sorted(set(keys[start:start + 500]))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({', '.join('?' * len(rows))})",
+                        [time.time()] + [key for key, _ in rows],
+                    )
+            self._conn.commit()
+        return {index: array("f", found[key]).tolist() for index, key in enumerate(keys) if key in found}
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = array("f", vector).tobytes()
+            rows.append((cache_key(model, text), model, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, size, last_used) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._stores += len(rows)
+            if self.max_bytes and self._stores >= EMBEDDING_CACHE_EVICT_EVERY:
+                self._stores = 0
+                self._evict_locked()
+
+    def _evict_locked(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        # Evict down to 90% so the next few stores do not trigger another pass
+        excess = total - int(self.max_bytes * 0.9)
+        evicted = 0
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used").fetchall():
+            if freed >= excess:
+                break
+            self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            freed += size
+            evicted += 1
+        self._conn.commit()
+        logging.info(f"Evicted {evicted} embeddings ({freed / 1e6:.1f} MB) from {self.path}")
+        return evicted
+
+    def evict(self):
+        """Evict least recently used vectors until the cache is within max_bytes; return how many."""
+        with self._lock:
+            return self._evict_locked()
+
+    def counts(self):
+        """Return {model: (vectors, bytes)}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT model, COUNT(*), SUM(size) FROM embeddings GROUP BY model").fetchall()
+        return {model: (count, size) for model, count, size in rows}
+
+    def clear(self, model=None):
+        with self._lock:
+            if model is None:
+                self._conn.execute("DELETE FROM embeddings")
+            else:
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+            self._conn.commit()
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide embedding cache; forked workers open their own connection."""
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache_pid != os.getpid():
+                _cache = EmbeddingCache()
+                _cache_pid = os.getpid()
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the embedding cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show cached vectors per model")
+    subparsers.add_parser("evict", help="Evict least recently used vectors down to EMBEDDING_CACHE_MAX_BYTES")
+    clear_parser = subparsers.add_parser("clear", help="Delete cached vectors")
+    clear_parser.add_argument("--model", help="Only this model or deployment")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    cache = get_cache()
+    if args.command == "evict":
+        logging.info(f"Evicted {cache.evict()} embeddings")
+    elif args.command == "clear":
+        cache.clear(args.model)
+    for model, (count, size) in sorted(cache.counts().items()):
+        logging.info(f"{model}: {count} vectors, {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from embedding_cache import EMBEDDING_CACHE_ENABLED, get_cache
+from politeness import BACKOFF_STATUSES, parse_retry_after
+
+try:
+    import tiktoken
+except ImportError:  # Token counts are estimated from the text length instead
+    tiktoken = None
+
+# Embedding client configuration
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))  # Inputs per request (Azure allows up to 2048)
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))  # Tokens per request, all inputs
+EMBEDDING_MAX_INPUT_TOKENS = int(os.getenv("EMBEDDING_MAX_INPUT_TOKENS", "8191"))  # Longer inputs are truncated
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))  # Requests in flight
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))  # Retries of a failed request
+EMBEDDING_BACKOFF = float(os.getenv("EMBEDDING_BACKOFF", "1.0"))  # First retry delay in seconds, doubled each retry
+EMBEDDING_MAX_BACKOFF = float(os.getenv("EMBEDDING_MAX_BACKOFF", "60"))
+EMBEDDING_TOKENIZER = os.getenv("EMBEDDING_TOKENIZER", "cl100k_base")  # tiktoken encoding of the embedding model
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "60"))  # Seconds per HTTP request
+
+# Results carry the caller's chunk ID, which can be any value, e.g. a (file name, chunk number) pair
+Embedding = namedtuple("Embedding", ["id", "text", "vector"])
+
+
+class EmbeddingRequestError(Exception):
+    """An embedding request failed; status is the HTTP status, or None for connection errors."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _retryable(error):
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if status is not None:
+        return status in BACKOFF_STATUSES or status == 408
+    # Connection errors and timeouts carry no status; the openai SDK raises APIConnectionError for both
+    return isinstance(error, (EmbeddingRequestError, ConnectionError, TimeoutError)) or any(
+        cls.__name__ == "APIConnectionError" for cls in type(error).__mro__
+    )
+
+
+def _retry_after(error):
+    if getattr(error, "retry_after", None) is not None:
+        return error.retry_after
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After"))
+
+
+class Tokenizer:
+    """Counts and truncates tokens with tiktoken, or estimates four characters per token without it."""
+
+    def __init__(self, encoding=EMBEDDING_TOKENIZER):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                # The encoding is downloaded on first use, which fails offline
+                logging.warning(f"Could not load tokenizer {encoding}, estimating token counts: {e}")
+
+    def count(self, text):
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def truncate(self, text, max_tokens):
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+        return text[:max_tokens * 4]
+
+
+def openai_backend(client, model):
+    """Embed a batch with an OpenAI or AzureOpenAI SDK client (or the openai module itself)."""
+
+    def embed_batch(texts):
+        response = client.embeddings.create(input=texts, model=model)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    return embed_batch
+
+
+def http_backend(url, api_key=None, model=None, timeout=EMBEDDING_TIMEOUT):
+    """
+    Embed a batch by POSTing to an OpenAI-compatible embeddings endpoint.
+
+    :param url: Full endpoint URL, e.g. https://<resource>.openai.azure.com/openai/deployments/<deployment>/
+                embeddings?api-version=2024-02-01, or the local stub in embedding_stub.py.
+    :param api_key: Sent as the api-key header used by Azure OpenAI.
+    :param model: Sent in the body for endpoints that select the model there.
+    """
+    import requests
+
+    import http_client
+
+    headers = {"api-key": api_key} if api_key else {}
+
+    def embed_batch(texts):
+        body = {"input": texts}
+        if model:
+            body["model"] = model
+        try:
+            response = http_client.get_session().post(url, json=body, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            raise EmbeddingRequestError(str(e))
+        if response.status_code != 200:
+            raise EmbeddingRequestError(
+                f"Embedding request failed with {response.status_code}: {response.text[:200]}",
+                response.status_code, parse_retry_after(response.headers.get("Retry-After")),
+            )
+        data = response.json()["data"]
+        return [item["embedding"] for item in sorted(data, key=lambda item: item["index"])]
+
+    return embed_batch
+
+
+class EmbeddingClient:
+    """
+    Embeds chunks in batches, with several requests in flight.
+
+    Chunks are packed into requests of up to max_batch_size inputs and max_batch_tokens tokens;
+    inputs longer than max_input_tokens are truncated. Failed requests are retried with
+    exponential backoff and jitter (or after the server's Retry-After) when the error is a
+    throttle, a server error or a connection error; other errors are raised.
+
+    Chunks found in the embedding cache are not sent, and identical chunks within a request are
+    sent once.
+
+    :param embed_batch: Function that embeds a list of texts and returns their vectors in order,
+                        e.g. from openai_backend() or http_backend().
+    :param model: Model or deployment ID, part of the cache key.
+    :param cache: EmbeddingCache to use; default the process-wide cache when EMBEDDING_CACHE_ENABLED,
+                  False for none.
+    """
+
+    def __init__(self, embed_batch, model=None, max_batch_size=None, max_batch_tokens=None, max_input_tokens=None,
+                 concurrency=None, max_retries=None, backoff=None, tokenizer=None, cache=None):
+        self.embed_batch = embed_batch
+        self.model = model
+        if cache is None:
+            cache = get_cache() if EMBEDDING_CACHE_ENABLED else False
+        self.cache = cache or None
+        self.max_batch_size = max_batch_size or EMBEDDING_BATCH_SIZE
+        self.max_batch_tokens = max_batch_tokens or EMBEDDING_BATCH_TOKENS
+        self.max_input_tokens = max_input_tokens or EMBEDDING_MAX_INPUT_TOKENS
+        self.concurrency = concurrency or EMBEDDING_CONCURRENCY
+        self.max_retries = EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = EMBEDDING_BACKOFF if backoff is None else backoff
+        self.tokenizer = tokenizer or Tokenizer()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    @classmethod
+    def from_openai(cls, client, model, **kwargs):
+        return cls(openai_backend(client, model), model, **kwargs)
+
+    @classmethod
+    def from_url(cls, url, api_key=None, model=None, **kwargs):
+        return cls(http_backend(url, api_key, model), model or url, **kwargs)
+
+    def _bump(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _batches(self, items):
+        """Group (chunk_id, text) items into batches within the input and token limits."""
+        batch, tokens = [], 0
+        for chunk_id, text in items:
+            count = self.tokenizer.count(text)
+            if count > self.max_input_tokens:
+                logging.warning(f"Truncating chunk {chunk_id} from {count} to {self.max_input_tokens} tokens")
+                text = self.tokenizer.truncate(text, self.max_input_tokens)
+                count = self.max_input_tokens
+            if batch and (len(batch) >= self.max_batch_size or tokens + count > self.max_batch_tokens):
+                yield batch
+                batch, tokens = [], 0
+            batch.append((chunk_id, text))
+            tokens += count
+        if batch:
+            yield batch
+
+    def _send(self, texts):
+        for attempt in range(self.max_retries + 1):
+            try:
+                vectors = self.embed_batch(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not _retryable(e):
+                    self._bump("failed_requests")
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.backoff * 2 ** attempt, EMBEDDING_MAX_BACKOFF) * random.uniform(0.5, 1.0)
+                logging.warning(f"Embedding request of {len(texts)} chunks failed ({e}), retrying in {delay:.1f}s")
+                self._bump("retries")
+                time.sleep(delay)
+                continue
+            if len(vectors) != len(texts):
+                raise EmbeddingRequestError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+            self._bump("requests")
+            return vectors
+
+    def _request(self, batch):
+        texts = [text for _, text in batch]
+        vectors = self.cache.get_many(self.model, texts) if self.cache else {}
+        self._bump("cache_hits", len(vectors))
+        # Boilerplate repeated within the batch is sent once
+        missing = list(dict.fromkeys(text for index, text in enumerate(texts) if index not in vectors))
+        if missing:
+            fetched = dict(zip(missing, self._send(missing)))
+            if self.cache:
+                self.cache.put_many(self.model, missing, [fetched[text] for text in missing])
+            for index, text in enumerate(texts):
+                if index not in vectors:
+                    vectors[index] = fetched[text]
+        self._bump("chunks", len(batch))
+        self._bump("sent", len(missing))
+        return [Embedding(chunk_id, text, vectors[index]) for index, (chunk_id, text) in enumerate(batch)]
+
+    def embed(self, items):
+        """
+        Embeds chunks, consuming them lazily.
+
+        :param items: Iterable of (chunk_id, text).
+        :yield: Embedding(id, text, vector) per chunk, in input order.
+        """
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding") as executor:
+            try:
+                for batch in self._batches(items):
+                    pending.append(executor.submit(self._request, batch))
+                    # A couple of batches per request slot keeps the slots busy without buffering the corpus
+                    if len(pending) >= self.concurrency * 2:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def summary(self):
+        """One-line summary of the run, for the end of an indexing script."""
+        chunks = self.stats["chunks"]
+        line = (f"Embedded {chunks} chunks: {self.stats['sent']} sent in {self.stats['requests']} requests, "
+                f"{self.stats['retries']} retries")
+        if self.cache:
+            hit_rate = self.stats["cache_hits"] / chunks if chunks else 0.0
+            line += f", {self.stats['cache_hits']} cache hits ({hit_rate:.1%} hit rate)"
+        return line
+
+    def embed_texts(self, texts):
+        """Return the vectors of a list of texts, in order."""
+        return [embedding.vector for embedding in self.embed(enumerate(texts))]
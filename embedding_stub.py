@@ -0,0 +1,133 @@
+"""
+Local stand-in for an OpenAI-compatible embeddings endpoint, for tests and benchmarks.
+
+Usage: python embedding_stub.py [--port 8090] [--latency 0.05] [--per-input-latency 0.0005] [--error-rate 0.05]
+
+Accepts POST /v1/embeddings and /openai/deployments/<deployment>/embeddings with a JSON body
+{"input": [...]} and answers like the real service. Vectors are derived from a hash of the text,
+so the same text always gets the same vector. Requests take latency plus per-input-latency
+seconds per input. A share of requests, set by error-rate, is answered with 429 and Retry-After.
+Batches over --max-batch-size inputs are rejected with 400.
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_vector(text, dimensions=1536):
+    """Deterministic unit-length vector for a text."""
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        block = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(value / 2147483648.0 for value in struct.unpack("<8i", block))
+        counter += 1
+    values = values[:dimensions]
+    norm = sum(value * value for value in values) ** 0.5 or 1.0
+    return [value / norm for value in values]
+
+
+class StubEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, dimensions=1536, latency=0.0, per_input_latency=0.0, error_rate=0.0,
+                 max_batch_size=2048, retry_after=0.1):
+        super().__init__(address, _Handler)
+        self.dimensions = dimensions
+        self.latency = latency
+        self.per_input_latency = per_input_latency
+        self.error_rate = error_rate
+        self.max_batch_size = max_batch_size
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.inputs = 0
+        self.throttled = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/embeddings"
+
+    def start(self):
+        """Serve on a background thread; return the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; Nagle would hold the body back for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=()):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.split("?")[0].endswith("/embeddings"):
+            return self._reply(404, {"error": {"message": "Not found"}})
+        inputs = body.get("input")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if not inputs or len(inputs) > server.max_batch_size:
+            return self._reply(400, {"error": {"message": f"input must hold 1 to {server.max_batch_size} items"}})
+
+        with server.lock:
+            server.requests += 1
+            throttled = random.random() < server.error_rate
+            if throttled:
+                server.throttled += 1
+            else:
+                server.inputs += len(inputs)
+        if throttled:
+            return self._reply(429, {"error": {"message": "Rate limit exceeded"}},
+                               [("Retry-After", str(server.retry_after))])
+
+        time.sleep(server.latency + server.per_input_latency * len(inputs))
+        data = [
+            {"object": "embedding", "index": index, "embedding": stub_vector(text, server.dimensions)}
+            for index, text in enumerate(inputs)
+        ]
+        tokens = sum(len(text) // 4 + 1 for text in inputs)
+        self._reply(200, {"object": "list", "data": data, "model": body.get("model", "stub"),
+                          "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve deterministic embeddings on an OpenAI-compatible API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request")
+    parser.add_argument("--per-input-latency", type=float, default=0.0005, help="Extra seconds per input")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--max-batch-size", type=int, default=2048)
+    args = parser.parse_args()
+
+    server = StubEmbeddingServer(
+        (args.host, args.port), args.dimensions, args.latency, args.per_input_latency, args.error_rate,
+        args.max_batch_size,
+    )
+    print(f"Serving stub embeddings on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
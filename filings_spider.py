@@ -1,23 +1,74 @@
 import scrapy
 import json
 import os
+import tempfile
 from urllib.parse import urljoin
 
+from frontier import CrawlFrontier, DONE, IN_FLIGHT
+
 class FilingsSpider(scrapy.Spider):
     name = 'multi_docs'
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Disk-backed frontier so a restarted pod continues where the previous one died
+        spider.frontier = CrawlFrontier(
+            crawler.settings.get('FRONTIER_PATH', 'crawl_state/frontier.db'),
+            checkpoint_interval=crawler.settings.getfloat('FRONTIER_CHECKPOINT_INTERVAL', 30),
+            max_attempts=crawler.settings.getint('FRONTIER_MAX_ATTEMPTS', 3),
+        )
+        spider.resume = crawler.settings.getbool('FRONTIER_RESUME', True)
+        return spider
+
+    def closed(self, reason):
+        self.log(f"Frontier state on close ({reason}): {self.frontier.counts()}")
+        self.frontier.close()
+
     def start_requests(self):
+        if self.resume and self.frontier.has_unfinished():
+            unfinished = self.frontier.unfinished()
+            self.log(f"Resuming crawl with {len(unfinished)} unfinished requests")
+            for method, url, callback, cb_kwargs in unfinished:
+                yield scrapy.Request(url=url, method=method, callback=getattr(self, callback), cb_kwargs=cb_kwargs,
+                                     errback=self.request_failed, meta={'frontier_key': (method, url)})
+            return
+
+        # The previous crawl finished (or resume is off): start over from the seeds
+        self.frontier.reset()
+
         # Load websites configuration
         with open('websites.json', 'r') as f:
             websites = json.load(f)
 
         for site in websites:
-            yield scrapy.Request(
+            yield from self.track(scrapy.Request(
                 url=site['url'],
                 callback=self.parse_dockets,
-                cb_kwargs={'docket_selector': site['docket_selector'], 
+                cb_kwargs={'docket_selector': site['docket_selector'],
                            'document_link_selector': site['document_link_selector']}
-            )
+            ))
+
+    def track(self, request):
+        """Record a request in the frontier, dropping it if an earlier run already completed it."""
+        if self.frontier.add(request.method, request.url, request.callback.__name__, request.cb_kwargs):
+            # Kept in meta so redirects are still marked against the URL the frontier knows
+            request.meta['frontier_key'] = (request.method, request.url)
+            yield request.replace(errback=self.request_failed)
+
+    def frontier_key(self, response):
+        return response.meta.get('frontier_key', (response.request.method, response.request.url))
+
+    def mark(self, response, state):
+        method, url = self.frontier_key(response)
+        self.frontier.mark(method, url, state)
+
+    def request_failed(self, failure):
+        """Errback: record DNS errors, HTTP errors and dropped requests so they do not stay pending."""
+        request = failure.request
+        method, url = request.meta.get('frontier_key', (request.method, request.url))
+        self.logger.warning(f"Request failed: {url}: {failure.value!r}")
+        self.frontier.fail(method, url)
 
     def parse_dockets(self, response, docket_selector, document_link_selector):
         # Extract docket numbers
@@ -26,31 +77,50 @@ class FilingsSpider(scrapy.Spider):
 
         for docket in dockets:
             docket_url = urljoin(response.url, docket)  # Assuming docket forms part of the URL
-            yield scrapy.Request(
+            yield from self.track(scrapy.Request(
                 url=docket_url,
                 callback=self.parse_documents,
                 cb_kwargs={'document_link_selector': document_link_selector}
-            )
+            ))
+
+        self.mark(response, DONE)
 
     def parse_documents(self, response, document_link_selector):
         # Extract document links for the docket
         for link in response.css(document_link_selector).re(r'.*\.(pdf|docx|xlsx)'):
             absolute_url = response.urljoin(link)
-            yield scrapy.Request(absolute_url, callback=self.download_file)
+            yield from self.track(scrapy.Request(absolute_url, callback=self.download_file))
+
+        self.mark(response, DONE)
 
     def download_file(self, response):
         file_name = response.url.split('/')[-1]
-        local_path = f"downloads/{file_name}"
+        handoff_mode = self.settings.get('HANDOFF_MODE', 'memory')
+        memory_limit = self.settings.getint('HANDOFF_MEMORY_LIMIT', 8 * 1024 * 1024)
+
+        if handoff_mode == 'memory' and len(response.body) <= memory_limit:
+            # Small filings go to the pipeline in memory and never touch the disk
+            item = {'file_name': file_name, 'file_body': response.body}
+        elif handoff_mode == 'memory':
+            # Large filings are written once to an anonymous temp file the pipeline uploads from
+            handle = tempfile.TemporaryFile()
+            handle.write(response.body)
+            handle.seek(0)
+            item = {'file_name': file_name, 'file_handle': handle}
+        else:
+            local_path = f"downloads/{file_name}"
+
+            # Save the file locally
+            os.makedirs('downloads', exist_ok=True)
+            with open(local_path, 'wb') as f:
+                f.write(response.body)
+            item = {'file_path': local_path, 'file_name': file_name}
 
-        # Save the file locally
-        os.makedirs('downloads', exist_ok=True)
-        with open(local_path, 'wb') as f:
-            f.write(response.body)
-        
         self.log(f"Downloaded file: {file_name}")
 
+        # The pipeline marks the request done once the file is uploaded; until then it is in flight
+        item['frontier_key'] = self.frontier_key(response)
+        self.mark(response, IN_FLIGHT)
+
         # Pass to pipeline for scanning and uploading
-        yield {
-            'file_path': local_path,
-            'file_name': file_name,
-        }
+        yield item
@@ -5,8 +5,12 @@ from pydantic import BaseModel
 import os
 import re
 import requests
-from bs4 import BeautifulSoup
+import http_client
+from link_extractor import find_document_links
+import politeness
 from azure.storage.blob import BlobServiceClient
+from async_fetcher import fetch_documents
+from jobs import add_job_routes
 
 # Configure structured logging for PromptFlow
 logging.basicConfig(
@@ -44,60 +48,44 @@ def get_case_number_from_url(url):
     match = re.search(r"(\d{4}-\d{5})", url)
     return match.group(1) if match else "unknown_case"
 
-def download_and_upload_document(document_url, year, case_number, document_name):
-    try:
-        logging.info(f"Downloading document: {document_url}")
-        response = requests.get(document_url, stream=True)
-        response.raise_for_status()
-
-        blob_client = container_client.get_blob_client(blob=f"{year}/{case_number}/{document_name}")
-        blob_client.upload_blob(response.content, overwrite=True)
-        logging.info(f"Uploaded to Azure Blob Storage: {year}/{case_number}/{document_name}")
-        return {"document_url": document_url, "status": "uploaded", "path": f"{year}/{case_number}/{document_name}"}
-    except Exception as e:
-        logging.error(f"Error processing document {document_url}: {e}")
-        return {"document_url": document_url, "status": "error", "error": str(e)}
-
-def scrape_case_documents(url):
+def scrape_case_documents(url, report=None):
+    """Scrape the webpage for document links and upload them, reporting each document's result as it completes."""
     year = get_year_from_url(url)
     case_number = get_case_number_from_url(url)
     results = []
 
     try:
         logging.info(f"Scraping URL: {url}")
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        document_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx|txt|xls)$'))
+        document_links = find_document_links(response.text, r'\.(pdf|docx|txt|xls)$')
 
+        documents = []
         for link in document_links:
-            document_url = link['href']
-            document_name = link.text.strip() or document_url.split('/')[-1]
+            document_url = link.href
+            document_name = link.text or document_url.split('/')[-1]
             full_document_url = requests.compat.urljoin(url, document_url)
-            result = download_and_upload_document(full_document_url, year, case_number, document_name)
-            results.append(result)
+            documents.append({"document_url": full_document_url, "path": f"{year}/{case_number}/{document_name}"})
 
-        return results
+        results.extend(fetch_documents(container_client, documents, report=report))
+        # Reported results are not returned again, so each document is listed once
+        return results if report is None else None
     except Exception as e:
         logging.error(f"Error scraping {url}: {e}")
         raise HTTPException(status_code=500, detail=f"Error scraping {url}: {e}")
 
-# FastAPI endpoint
-@app.post("/scrape", response_model=ScrapeResponse)
-def scrape(request: ScrapeRequest):
-    overall_results = []
-    for url in request.urls:
-        try:
-            results = scrape_case_documents(url)
-            overall_results.extend(results)
-        except Exception as e:
-            logging.error(f"Error processing URL {url}: {e}")
-            overall_results.append({"url": url, "status": "error", "error": str(e)})
-
-    return {
-        "status": "completed",
-        "message": "Scraping completed with some results.",
-        "details": overall_results
-    }
+# FastAPI endpoints: scrapes run as background jobs so PromptFlow does not hold a connection open
+add_job_routes(app, "/scrape", scrape_case_documents, ScrapeRequest)
+
+
+@app.get("/stats/http")
+def http_stats():
+    """Connection pool hit/miss and reuse counters per host."""
+    return http_client.pool_stats()
+
 
+@app.get("/stats/hosts")
+def host_stats():
+    """Current adaptive concurrency, delay and request rate per host."""
+    return politeness.host_rates()
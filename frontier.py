@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"  # Downloaded and handed to the item pipeline, not stored yet
+DONE = "done"
+FAILED = "failed"
+
+
+def request_fingerprint(method, url):
+    """Stable fingerprint of a request across process restarts."""
+    return hashlib.sha1(f"{method.upper()} {url}".encode("utf-8")).hexdigest()
+
+
+class CrawlFrontier:
+    """
+    Disk-backed crawl frontier: pending, in-flight, completed and failed requests by fingerprint.
+
+    A downloaded document stays in flight until the item pipeline has stored it and marks it
+    done, so a crash between download and upload leaves it to be fetched again on resume.
+    Failed requests (DNS errors, HTTP errors, requests dropped by a middleware) are kept with
+    their attempt count. They do not hold a crawl open, and are scheduled again when rediscovered
+    until they have failed max_attempts times.
+
+    Writes are grouped into transactions that are committed every checkpoint_interval seconds
+    (and on close), so a crash loses at most that much progress, which is refetched on resume.
+    """
+
+    def __init__(self, path, checkpoint_interval=30, max_attempts=3):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            "fingerprint TEXT PRIMARY KEY, method TEXT, url TEXT, callback TEXT, cb_kwargs TEXT, "
+            "state TEXT, updated_at REAL, attempts INTEGER DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(frontier)")}
+        if "attempts" not in columns:
+            # Frontiers written before failures were recorded
+            self._conn.execute("ALTER TABLE frontier ADD COLUMN attempts INTEGER DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state)")
+        self._conn.commit()
+        self._last_checkpoint = time.monotonic()
+
+    def counts(self):
+        """Number of requests per state."""
+        rows = self._conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+    def has_unfinished(self):
+        """Whether requests are pending or in flight; failed ones do not count, so dead URLs do not hold a crawl."""
+        row = self._conn.execute(
+            "SELECT 1 FROM frontier WHERE state IN (?, ?) LIMIT 1", (PENDING, IN_FLIGHT)
+        ).fetchone()
+        return row is not None
+
+    def reset(self):
+        """Forget a finished crawl so the next one starts from the seeds."""
+        self._conn.execute("DELETE FROM frontier")
+        self._conn.commit()
+
+    def add(self, method, url, callback, cb_kwargs):
+        """
+        Records a newly discovered request.
+
+        :return: False when the request was already completed or is in flight, or failed
+                 max_attempts times, and should not be scheduled again.
+        """
+        fingerprint = request_fingerprint(method, url)
+        row = self._conn.execute(
+            "SELECT state, attempts FROM frontier WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+        if row and (row[0] in (DONE, IN_FLIGHT) or (row[0] == FAILED and row[1] >= self.max_attempts)):
+            return False
+        if row and row[0] == FAILED:
+            self.mark(method, url, PENDING)
+        elif not row:
+            self._conn.execute(
+                "INSERT INTO frontier (fingerprint, method, url, callback, cb_kwargs, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, method, url, callback, json.dumps(cb_kwargs or {}), PENDING, time.time()),
+            )
+            self._maybe_checkpoint()
+        return True
+
+    def mark(self, method, url, state):
+        self._conn.execute(
+            "UPDATE frontier SET state = ?, updated_at = ? WHERE fingerprint = ?",
+            (state, time.time(), request_fingerprint(method, url)),
+        )
+        self._maybe_checkpoint()
+
+    def fail(self, method, url):
+        """Record a failed attempt at a request."""
+        self._conn.execute(
+            "UPDATE frontier SET state = ?, attempts = attempts + 1, updated_at = ? WHERE fingerprint = ?",
+            (FAILED, time.time(), request_fingerprint(method, url)),
+        )
+        self._maybe_checkpoint()
+
+    def unfinished(self):
+        """Requests left pending or in flight by a previous process, as (method, url, callback, cb_kwargs)."""
+        rows = self._conn.execute(
+            "SELECT method, url, callback, cb_kwargs FROM frontier WHERE state IN (?, ?) ORDER BY updated_at",
+            (PENDING, IN_FLIGHT),
+        ).fetchall()
+        return [(method, url, callback, json.loads(cb_kwargs)) for method, url, callback, cb_kwargs in rows]
+
+    def _maybe_checkpoint(self):
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        self._conn.commit()
+        self._last_checkpoint = time.monotonic()
+
+    def close(self):
+        self.checkpoint()
+        self._conn.close()
@@ -0,0 +1,194 @@
+import logging
+import os
+import socket
+import ssl
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+import politeness
+
+# Connection pool configuration
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))  # Host pools kept alive at once
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))  # Keep-alive connections per host
+# Per-host overrides, e.g. "psc.ky.gov=32,www.puc.pa.gov=8"
+HTTP_POOL_SIZES = os.getenv("HTTP_POOL_SIZES", "")
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))  # Seconds; 0 disables the cache
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))  # Retries of 429/503 responses after Retry-After
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: defaultdict(int))
+
+
+def _count(host, counter):
+    with _stats_lock:
+        _stats[host][counter] += 1
+
+
+def pool_stats():
+    """
+    Returns connection pool counters per host.
+
+    pool_hits/pool_misses count lookups that found (or had to create) the host's pool.
+    connections_reused/connections_opened count requests served on a kept-alive
+    connection versus ones that needed a new TCP (and TLS) handshake.
+    """
+    with _stats_lock:
+        return {host: dict(counters) for host, counters in _stats.items()}
+
+
+def log_pool_stats():
+    """Log the connection pool counters per host."""
+    for host, counters in sorted(pool_stats().items()):
+        logging.info(f"HTTP pool stats for {host}: {counters}")
+
+
+class _CountingPoolMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        # An idle connection handed back from the pool still holds its socket
+        if getattr(conn, "sock", None) is not None:
+            _count(self.host, "connections_reused")
+        else:
+            _count(self.host, "connections_opened")
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CountingPoolManager(PoolManager):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def connection_from_pool_key(self, pool_key, request_context=None):
+        with self.pools.lock:
+            hit = self.pools.get(pool_key) is not None
+        _count(request_context["host"], "pool_hits" if hit else "pool_misses")
+        return super().connection_from_pool_key(pool_key, request_context=request_context)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with counted keep-alive pools, a shared TLS context and default timeouts."""
+
+    def __init__(self, pool_maxsize=HTTP_POOL_MAXSIZE, timeout=None, **kwargs):
+        self.timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        super().__init__(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=pool_maxsize, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        # One TLS context for every connection from this adapter
+        pool_kwargs.setdefault("ssl_context", _ssl_context())
+        self.poolmanager = _CountingPoolManager(num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+
+_ssl_context_instance = None
+
+
+def _ssl_context():
+    global _ssl_context_instance
+    if _ssl_context_instance is None:
+        _ssl_context_instance = ssl.create_default_context()
+    return _ssl_context_instance
+
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_original_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    with _dns_lock:
+        entry = _dns_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+    result = _original_getaddrinfo(host, port, family, type, proto, flags)
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def _install_dns_cache():
+    if DNS_CACHE_TTL > 0 and socket.getaddrinfo is _original_getaddrinfo:
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+def _parse_pool_sizes(value):
+    sizes = {}
+    for entry in value.split(","):
+        if "=" in entry:
+            host, size = entry.split("=", 1)
+            sizes[host.strip()] = int(size)
+    return sizes
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide requests session shared by all scrapers."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _install_dns_cache()
+                session = requests.Session()
+                session.mount("http://", PooledHTTPAdapter())
+                session.mount("https://", PooledHTTPAdapter())
+                for host, size in _parse_pool_sizes(HTTP_POOL_SIZES).items():
+                    session.mount(f"http://{host}/", PooledHTTPAdapter(pool_maxsize=size))
+                    session.mount(f"https://{host}/", PooledHTTPAdapter(pool_maxsize=size))
+                _session = session
+    return _session
+
+
+def get(url, **kwargs):
+    """
+    Sends a GET request through the shared session, paced by the per-host politeness controller.
+
+    429 and 503 responses are retried up to HTTP_MAX_RETRIES times; the controller holds the
+    host off until its Retry-After deadline before the next attempt.
+    """
+    host = urlsplit(url).netloc
+    controller = politeness.get_controller()
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        controller.acquire(host)
+        start = time.monotonic()
+        response = None
+        try:
+            response = get_session().get(url, **kwargs)
+        finally:
+            controller.release(
+                host,
+                response.status_code if response is not None else None,
+                time.monotonic() - start,
+                response.headers.get("Retry-After") if response is not None else None,
+            )
+        if response.status_code not in (429, 503) or attempt == HTTP_MAX_RETRIES:
+            return response
+        response.close()
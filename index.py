@@ -6,6 +6,8 @@ from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.vector_stores import SimpleVectorStore
 from azure.ai.search import SearchClient
 from azure.core.credentials import AzureKeyCredential
+from blob_listing import iter_blobs
+from chunking import chunk_text
 
 # Define environment variables for PromptFlow
 AZURE_BLOB_CONNECTION_STRING = os.environ.get("AZURE_BLOB_CONNECTION_STRING")
@@ -22,19 +24,18 @@ def download_files_from_blob(container_name, download_path):
     container_client = blob_service_client.get_container_client(container_name)
     
     os.makedirs(download_path, exist_ok=True)
-    for blob in container_client.list_blobs():
-        if blob.name.endswith((".pdf", ".docx", ".txt")):
-            file_path = os.path.join(download_path, blob.name)
-            with open(file_path, "wb") as file:
-                file.write(container_client.download_blob(blob.name).readall())
+    # Year/case prefixes are listed in parallel and downloads start with the first blobs found;
+    # this is the run's full listing, so it is snapshotted for blob_listing's diff
+    for blob in iter_blobs(container_client, suffixes=(".pdf", ".docx", ".txt"), snapshot=True):
+        file_path = os.path.join(download_path, blob.name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as file:
+            file.write(container_client.download_blob(blob.name).readall())
     print(f"Downloaded files to {download_path}")
 
 def chunk_document(content, max_tokens=500):
     """Chunk documents while preserving context."""
-    from llama_index.text_splitter import TokenTextSplitter
-
-    splitter = TokenTextSplitter(chunk_size=max_tokens, chunk_overlap=100)
-    return splitter.split_text(content)
+    return [chunk.text for chunk in chunk_text(content, size=max_tokens, overlap=100, unit="token")]
 
 def create_embeddings_and_index(files_dir):
     """Create embeddings and an index using LlamaIndex."""
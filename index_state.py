@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import posixpath
+import time
+from collections import Counter, namedtuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from vector_shards import VectorShardReader, VectorShardWriter, load_manifest
+
+# Re-indexing configuration
+INDEX_MODE = os.getenv("INDEX_MODE", "incremental")  # "incremental" or "full"
+VECTORS_FORMAT = os.getenv("VECTORS_FORMAT", "shards")  # "shards" (see vector_shards.py) or "json"
+
+# new and changed are the source blobs to (re-)index; removed ones are tombstoned
+IndexPlan = namedtuple("IndexPlan", ["new", "changed", "removed", "unchanged"])
+
+
+def state_path(vectors_name):
+    """Return the blob path of the state kept next to a vector store, e.g. docVectors_azure.state.json."""
+    return f"{posixpath.splitext(vectors_name)[0]}.state.json"
+
+
+def _version(blob):
+    return {
+        "etag": blob.etag,
+        "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
+        "size": blob.size,
+    }
+
+
+class IndexState:
+    """
+    Records, per source blob, the ETag and last-modified time it was indexed at.
+
+    The state is a JSON blob next to the vector store, so any runner can pick it up. Source blobs
+    deleted since the last run are kept as tombstones with their deletion time, for consumers
+    that mirror the vector store elsewhere (e.g. a search index).
+    """
+
+    def __init__(self, storage, container, vectors_name):
+        self.storage = storage
+        self.container = container
+        self.path = state_path(vectors_name)
+        self.documents = {}
+        self.tombstones = {}
+
+    def load(self):
+        try:
+            data = json.loads(self.storage.download(self.container, self.path))
+        except ResourceNotFoundError:
+            data = {}
+        self.documents = data.get("documents", {})
+        self.tombstones = data.get("tombstones", {})
+        return self
+
+    def save(self):
+        data = {"documents": self.documents, "tombstones": self.tombstones}
+        self.storage.upload(self.container, self.path, json.dumps(data, sort_keys=True))
+
+    def is_current(self, blob):
+        recorded = self.documents.get(blob.name)
+        if recorded is None:
+            return False
+        version = _version(blob)
+        # Fall back to the modification time for listings without ETags
+        if version["etag"] and recorded.get("etag"):
+            return version["etag"] == recorded["etag"]
+        return version["last_modified"] == recorded.get("last_modified") and version["size"] == recorded.get("size")
+
+    def plan(self, blobs):
+        """Compare a source listing with the recorded state; return an IndexPlan of blob names."""
+        new, changed, unchanged = [], [], []
+        names = set()
+        for blob in blobs:
+            names.add(blob.name)
+            if blob.name not in self.documents:
+                new.append(blob.name)
+            elif self.is_current(blob):
+                unchanged.append(blob.name)
+            else:
+                changed.append(blob.name)
+        removed = sorted(name for name in self.documents if name not in names)
+        return IndexPlan(sorted(new), sorted(changed), removed, sorted(unchanged))
+
+    def record(self, blob, chunks):
+        entry = _version(blob)
+        entry.update(chunks=chunks, indexed_at=time.time())
+        self.documents[blob.name] = entry
+        self.tombstones.pop(blob.name, None)
+
+    def tombstone(self, name):
+        self.documents.pop(name, None)
+        self.tombstones[name] = time.time()
+
+
+def load_vectors(storage, container, vectors_name):
+    """Return the records of a JSON vector store, or an empty list when there is none yet."""
+    try:
+        return json.loads(storage.download(container, vectors_name))
+    except ResourceNotFoundError:
+        return []
+
+
+def write_shards(storage, container, vectors_name, records, keep_existing=None):
+    """
+    Writes records to new shards of a shard store as they are produced, then carries over the
+    current rows whose filename keep_existing accepts; return the rows in the store.
+
+    Shards holding only kept documents are carried over as they are, without being read. Only
+    the shards that also hold a re-indexed or deleted document are read and their kept rows
+    rewritten, so a run costs what it changes rather than the size of the store.
+    """
+    manifest = load_manifest(storage, container, vectors_name)
+    with VectorShardWriter(storage, container, vectors_name) as writer:
+        for record in records:
+            writer.write(record)
+        if manifest and keep_existing:
+            rewrite = []
+            for info in manifest["shards"]:
+                # Shards written before filenames were recorded have to be read to know
+                if writer.can_keep(manifest) and "filenames" in info and all(map(keep_existing, info["filenames"])):
+                    writer.keep(manifest, info)
+                else:
+                    rewrite.append(info)
+            for shard in VectorShardReader(storage, container, vectors_name).shards(rewrite):
+                writer.copy(shard, lambda metadata: keep_existing(metadata["filename"]))
+        elif keep_existing:
+            # First run after switching from the JSON format: carry its records over
+            for record in load_vectors(storage, container, vectors_name):
+                if keep_existing(record["filename"]):
+                    writer.write(record)
+    return writer.count
+
+
+def update_vectors(storage, source_container, dest_container, vectors_name, index_documents, mode=None,
+                   vectors_format=None):
+    """
+    Brings a vector store up to date with the PDFs in a source container.
+
+    In incremental mode only new and changed PDFs are handed to index_documents. Their records
+    replace the ones stored for them; records of deleted PDFs are dropped and the PDFs tombstoned.
+    PDFs whose text yields no chunks (e.g. scanned images) are recorded with 0 chunks and not
+    retried until they change. PDFs that fail to extract keep their previous records and are
+    retried on the next run. Full mode re-indexes every PDF into a fresh store.
+
+    :param index_documents: Function taking a list of source blob names and a callback, and yielding
+                            records ({"id", "filename", "text", "embedding"}) for them. It calls the
+                            callback with each blob name once its text is extracted.
+    :param mode: "incremental" or "full", default INDEX_MODE.
+    :param vectors_format: "shards" to stream records into a binary shard store next to vectors_name,
+                           or "json" for a single JSON list at vectors_name; default VECTORS_FORMAT.
+    :return: IndexPlan of the run.
+    """
+    mode = mode or INDEX_MODE
+    vectors_format = vectors_format or VECTORS_FORMAT
+    if mode not in ("incremental", "full"):
+        raise ValueError(f"Unsupported index mode: {mode}")
+    if vectors_format not in ("shards", "json"):
+        raise ValueError(f"Unsupported vectors format: {vectors_format}")
+    storage.ensure_container(dest_container)
+    state = IndexState(storage, dest_container, vectors_name)
+    if mode == "incremental":
+        state.load()
+
+    blobs = {blob.name: blob for blob in storage.list(source_container, suffixes=".pdf")}
+    plan = state.plan(blobs.values())
+    logging.info(f"Index plan for {source_container}: {len(plan.new)} new, {len(plan.changed)} changed, "
+                 f"{len(plan.removed)} removed, {len(plan.unchanged)} unchanged")
+    if mode == "incremental" and not (plan.new or plan.changed or plan.removed):
+        # Nothing to index or drop; a shard store is still written once to migrate a JSON store
+        if vectors_format == "json" or load_manifest(storage, dest_container, vectors_name) is not None:
+            logging.info("The vector store is up to date")
+            return plan
+
+    chunks = Counter()
+
+    def extracted(name):
+        # Present with 0 until its records arrive, so a PDF without text is still recorded
+        chunks[name] += 0
+
+    def counted(records):
+        for record in records:
+            chunks[record["filename"]] += 1
+            yield record
+
+    records = counted(index_documents(plan.new + plan.changed, extracted))
+    # Existing records are kept unless their PDF was re-indexed or deleted; this is only
+    # known once the new records are written, which is why those are copied after them
+    removed = set(plan.removed)
+
+    def keep_existing(filename):
+        return filename not in chunks and filename not in removed
+
+    if vectors_format == "shards":
+        stored = write_shards(storage, dest_container, vectors_name, records,
+                              keep_existing if mode == "incremental" else None)
+    else:
+        records = list(records)
+        existing = load_vectors(storage, dest_container, vectors_name) if mode == "incremental" else []
+        merged = [record for record in existing if keep_existing(record["filename"])] + records
+        storage.upload(dest_container, vectors_name, json.dumps(merged))
+        stored = len(merged)
+
+    # The state is written last: a run that dies before this re-indexes the same PDFs next time
+    for name in chunks:
+        state.record(blobs[name], chunks[name])
+    for name in plan.removed:
+        state.tombstone(name)
+    state.save()
+    failed = len(plan.new) + len(plan.changed) - len(chunks)
+    logging.info(f"Indexed {len(chunks)} PDFs ({sum(chunks.values())} chunks), tombstoned {len(plan.removed)}, "
+                 f"{failed} failed; the store holds {stored} chunks")
+    return plan
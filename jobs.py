@@ -0,0 +1,205 @@
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Job execution configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # Scrape jobs running at once per API pod
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))  # Queued jobs accepted before /scrape returns 503
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "500"))  # Finished jobs kept for status queries
+JOB_STREAM_HEARTBEAT = float(os.getenv("JOB_STREAM_HEARTBEAT", "15"))  # Seconds between heartbeat records
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class Job:
+    """A scrape job and the per-document results it has produced so far."""
+
+    def __init__(self, urls):
+        self.id = uuid.uuid4().hex
+        self.urls = list(urls)
+        self.status = QUEUED
+        self.error = None
+        self.results = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._condition = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in (COMPLETED, FAILED)
+
+    def append(self, result):
+        with self._condition:
+            self.results.append(result)
+            self._condition.notify_all()
+
+    def set_status(self, status, error=None):
+        with self._condition:
+            self.status = status
+            self.error = error
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in (COMPLETED, FAILED):
+                self.finished_at = time.time()
+            self._condition.notify_all()
+
+    def wait_for(self, index, timeout):
+        """Block until there are results past index or the job finishes; return (new results, done)."""
+        with self._condition:
+            if len(self.results) <= index and not self.done:
+                self._condition.wait(timeout=timeout)
+            return self.results[index:], self.done
+
+    def summary(self, offset=0):
+        with self._condition:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "message": self.error or f"{len(self.results)} results for {len(self.urls)} URLs.",
+                "urls": self.urls,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "details": self.results[offset:],
+            }
+
+
+class JobManager:
+    """Runs scrape jobs on a bounded worker pool so API requests return immediately."""
+
+    def __init__(self, workers=JOB_WORKERS, queue_limit=JOB_QUEUE_LIMIT, history=JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.queue_limit = queue_limit
+        self.history = history
+
+    def submit(self, urls, scrape_fn):
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if queued >= self.queue_limit:
+                raise HTTPException(status_code=503, detail="Too many queued scrape jobs, retry later.")
+            job = Job(urls)
+            self._jobs[job.id] = job
+            self._evict()
+        self._executor.submit(self._run, job, scrape_fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+        return job
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, scrape_fn):
+        job.set_status(RUNNING)
+        # Scrapers taking a report callback hand over each document's result as soon as it is done
+        reports = "report" in inspect.signature(scrape_fn).parameters
+        try:
+            for url in job.urls:
+                try:
+                    result = scrape_fn(url, report=job.append) if reports else scrape_fn(url)
+                except Exception as e:
+                    logging.error(f"Error processing URL {url}: {e}")
+                    result = {"url": url, "status": "error", "error": str(getattr(e, "detail", e))}
+                if result is None:
+                    job.append({"url": url, "status": "completed"})
+                elif isinstance(result, list):
+                    for document_result in result:
+                        job.append(document_result)
+                else:
+                    job.append(result)
+            job.set_status(COMPLETED)
+        except Exception as e:
+            logging.error(f"Scrape job {job.id} failed: {e}")
+            job.set_status(FAILED, str(e))
+
+    def stream(self, job):
+        """
+        Yield the job's results as NDJSON lines, ending with the job summary.
+
+        While no results arrive, a {"type": "heartbeat"} record is sent every JOB_STREAM_HEARTBEAT
+        seconds, so every line is a JSON object.
+        """
+        index = 0
+        while True:
+            results, done = job.wait_for(index, JOB_STREAM_HEARTBEAT)
+            for result in results:
+                yield json.dumps(result) + "\n"
+            index += len(results)
+            if done and not results:
+                summary = job.summary(offset=len(job.results))
+                del summary["details"]
+                yield json.dumps(summary) + "\n"
+                return
+            if not results:
+                # Keeps proxies from closing an idle stream on long crawls
+                yield json.dumps({"type": "heartbeat"}) + "\n"
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """Return the process-wide job manager."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
+
+
+def add_job_routes(app, path, scrape_fn, request_model):
+    """
+    Registers job-based scrape endpoints on a FastAPI app.
+
+    POST {path} enqueues the request's URLs and returns a job ID, GET {path}/{job_id} returns the
+    job status and results so far, and GET {path}/{job_id}/stream streams per-document results
+    as NDJSON until the job finishes.
+
+    :param scrape_fn: Function called with each URL. If it takes a report argument, it is passed
+                      a callback to report each document's result as soon as it is done; its
+                      return value, if not None, is added as the URL's own result.
+    """
+    manager = get_manager()
+
+    def submit(request: request_model):
+        job = manager.submit(request.urls, scrape_fn)
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"{path}/{job.id}",
+            "stream_url": f"{path}/{job.id}/stream",
+        }
+
+    def status(job_id: str, offset: int = 0):
+        return manager.get(job_id).summary(offset=offset)
+
+    def stream(job_id: str):
+        job = manager.get(job_id)
+        return StreamingResponse(manager.stream(job), media_type="application/x-ndjson")
+
+    app.post(path, status_code=202)(submit)
+    app.get(f"{path}/{{job_id}}")(status)
+    app.get(f"{path}/{{job_id}}/stream")(stream)
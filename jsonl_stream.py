@@ -0,0 +1,82 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # Lines are decoded with the standard library instead
+    orjson = None
+
+# JSON Lines decoding configuration
+JSONL_DECODER = os.getenv("JSONL_DECODER", "auto")  # "auto" (orjson when installed), "orjson" or "json"
+
+# Decoders take the bytes of one line; register others (e.g. simdjson) with register_decoder
+_decoders = {"json": json.loads}
+if orjson is not None:
+    _decoders["orjson"] = orjson.loads
+
+
+def register_decoder(name, loads):
+    """Register a function decoding one JSON document from bytes, for JSONL_DECODER=name."""
+    _decoders[name] = loads
+
+
+def get_decoder(name=None):
+    """Return the decoder registered under name, default JSONL_DECODER."""
+    name = name or JSONL_DECODER
+    if name == "auto":
+        name = "orjson" if "orjson" in _decoders else "json"
+    if name not in _decoders:
+        raise ValueError(f"Unsupported JSONL decoder: {name}")
+    return _decoders[name]
+
+
+def iter_lines(chunks):
+    """
+    Splits a stream of byte chunks into lines, in time linear in the size of the stream.
+
+    Each chunk is searched for newlines once; the part of a line that continues into the next
+    chunk is kept in a bytearray, so lines longer than a chunk are assembled without re-scanning
+    or re-copying what came before. Nothing is decoded, so multi-byte characters split across
+    chunks are whole again by the time a line is. Chunks that are not bytes (memoryview,
+    bytearray) are copied to bytes first, so lines never share a buffer the caller reuses.
+
+    :param chunks: Iterable of bytes-like chunks, e.g. Storage.stream().
+    :yield: Each line as bytes, without its newline.
+    """
+    pending = bytearray()
+    for chunk in chunks:
+        if not isinstance(chunk, bytes):
+            chunk = bytes(chunk)
+        newline = chunk.find(b"\n")
+        if newline == -1:
+            pending += chunk
+            continue
+        if pending:
+            pending += memoryview(chunk)[:newline]
+            yield bytes(pending)
+            pending.clear()
+        else:
+            yield chunk[:newline]
+        start = newline + 1
+        newline = chunk.find(b"\n", start)
+        while newline != -1:
+            yield chunk[start:newline]
+            start = newline + 1
+            newline = chunk.find(b"\n", start)
+        pending += memoryview(chunk)[start:]
+    if pending:
+        yield bytes(pending)
+
+
+def stream_jsonl(chunks, decoder=None):
+    """
+    Decodes a JSON Lines stream given as byte chunks, skipping blank lines.
+
+    :param chunks: Iterable of bytes-like chunks, e.g. Storage.stream().
+    :param decoder: Decoder name or function taking bytes, default JSONL_DECODER.
+    :yield: Each JSON value in the stream.
+    """
+    loads = decoder if callable(decoder) else get_decoder(decoder)
+    for line in iter_lines(chunks):
+        if line and not line.isspace():
+            yield loads(line)
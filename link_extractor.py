@@ -0,0 +1,111 @@
+import re
+from collections import namedtuple
+from html import unescape
+
+# Document types the case and docket scrapers collect
+DOCUMENT_LINK_PATTERN = r'\.(pdf|docx|txt|xls|xlsx)$'
+
+Link = namedtuple("Link", ["href", "text"])
+
+# One pass over the markup: comments and raw-text elements are skipped whole, CDATA sections are
+# kept as literal text, anchors and other elements are opened and closed, and the text between
+# tags is collected.
+_TOKENS = re.compile(
+    r"<!--.*?(?:-->|\Z)"
+    r"|<!\[CDATA\[(?P<cdata>.*?)\]\]>"
+    r"|<(?P<raw>script|style)\b[^>]*>.*?(?:</(?P=raw)\s*>|\Z)"
+    r"|<a(?P<attrs>(?:[\s/](?:[^>\"']|\"[^\"]*\"|'[^']*')*)?)>"
+    r"|</(?P<end>[a-zA-Z][^\s/>]*)[^>]*>"
+    r"|<(?P<start>[a-zA-Z][^\s/>]*)(?P<rest>(?:[^>\"']|\"[^\"]*\"|'[^']*')*)>"
+    r"|<[!?][a-zA-Z](?:[^>\"']|\"[^\"]*\"|'[^']*')*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_ATTRIBUTE = re.compile(r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]*)))?""")
+
+# Elements that never have content, so they are never left open
+_VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+))
+
+
+def _attributes(attrs):
+    """Return (href, self_closing) for the attribute text of a tag."""
+    href = None
+    end = 0
+    # Later duplicates win, as in BeautifulSoup
+    for match in _ATTRIBUTE.finditer(attrs):
+        name, double, single, bare = match.groups()
+        if name.lower() == "href":
+            href = unescape(double or single or bare)
+        end = match.end()
+    # <a href="x.pdf"/> is closed at once, but the slash of an unquoted href=x/ is part of the value
+    return href, attrs.endswith("/") and end < len(attrs)
+
+
+def iter_anchors(html):
+    """
+    Yields (href, text) for every <a> tag in document order, in a single pass over the markup.
+
+    href is None for anchors without one; text is the unescaped, unstripped text of the anchor
+    including nested elements and CDATA sections, matching BeautifulSoup's tag.text with
+    html.parser. Self-closing anchors have no text. As in BeautifulSoup, an end tag closes every
+    element opened after the matching start tag, so </div> also closes an anchor left open
+    inside the div, and end tags without an open element are ignored.
+    """
+    # Names of the open elements, and the open anchors as (position in elements, [href, text parts])
+    elements = []
+    anchors = []
+    emitted = []
+    position = 0
+
+    def collect(text):
+        for _, anchor in anchors:
+            anchor[1].append(text)
+
+    for match in _TOKENS.finditer(html):
+        if anchors and match.start() > position:
+            collect(unescape(html[position:match.start()]))
+        position = match.end()
+
+        if match.group("cdata") is not None:
+            if anchors:
+                collect(match.group("cdata"))
+        elif match.group("attrs") is not None:
+            href, self_closing = _attributes(match.group("attrs"))
+            anchor = [href, []]
+            if not self_closing:
+                anchors.append((len(elements), anchor))
+                elements.append("a")
+            emitted.append(anchor)
+        elif match.group("start") is not None:
+            name = match.group("start").lower()
+            rest = match.group("rest")
+            if name not in _VOID_ELEMENTS and not (rest.endswith("/") and _attributes(rest)[1]):
+                elements.append(name)
+        elif match.group("end") is not None:
+            name = match.group("end").lower()
+            # Close the innermost open element of that name and everything opened inside it
+            for index in range(len(elements) - 1, -1, -1):
+                if elements[index] == name:
+                    del elements[index:]
+                    while anchors and anchors[-1][0] >= index:
+                        anchors.pop()
+                    break
+
+    if anchors and position < len(html):
+        collect(unescape(html[position:]))
+
+    for href, parts in emitted:
+        yield href, "".join(parts)
+
+
+def find_document_links(html, pattern=DOCUMENT_LINK_PATTERN):
+    """
+    Finds anchors whose href matches a pattern, like soup.find_all('a', href=re.compile(pattern)).
+
+    :param html: Page markup.
+    :param pattern: Regular expression searched in each href.
+    :return: List of Link(href, text) with the anchor text stripped.
+    """
+    regex = re.compile(pattern)
+    return [Link(href, text.strip()) for href, text in iter_anchors(html) if href and regex.search(href)]
@@ -1,9 +1,11 @@
 import os
 import re
 import requests
-from bs4 import BeautifulSoup
+import http_client
+from link_extractor import find_document_links
 from fastapi import FastAPI, HTTPException
 from azure.storage.blob import BlobServiceClient
+from blob_transfer import transfer_document
 
 # Environment variables
 AZURE_CONNECTION_STRING = os.getenv("AZURE_CONNECTION_STRING")
@@ -21,10 +23,9 @@ def get_docket_number_from_url(url):
 
 def download_and_upload_document(document_url, folder_name, document_name):
     try:
-        response = requests.get(document_url, stream=True)
-        response.raise_for_status()
         blob_client = container_client.get_blob_client(blob=f"{folder_name}/{document_name}")
-        blob_client.upload_blob(response.content, overwrite=True)
+        # Stream the document into the blob block by block
+        transfer_document(document_url, blob_client)
         return f"Uploaded {document_name} to {folder_name}"
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -33,14 +34,13 @@ def download_and_upload_document(document_url, folder_name, document_name):
 async def scrape_documents(url: str):
     docket_number = get_docket_number_from_url(url)
     try:
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        document_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx)$'))
+        document_links = find_document_links(response.text, r'\.(pdf|docx)$')
         results = []
         for link in document_links:
-            document_url = requests.compat.urljoin(url, link['href'])
-            document_name = link.text.strip() or document_url.split('/')[-1]
+            document_url = requests.compat.urljoin(url, link.href)
+            document_name = link.text or document_url.split('/')[-1]
             result = download_and_upload_document(document_url, docket_number, document_name)
             results.append(result)
         return {"message": results}
@@ -0,0 +1,190 @@
+import argparse
+import logging
+import os
+import sqlite3
+import string
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import quote
+
+# Document manifest location
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "manifest.db")
+# Skip documents the manifest already records for the same source URL without downloading them
+MANIFEST_SKIP_KNOWN = os.getenv("MANIFEST_SKIP_KNOWN", "true").lower() == "true"
+# Blob metadata key holding the SHA-256 of the blob's bytes
+DIGEST_METADATA_KEY = "content_sha256"
+# Blob metadata key pointing a reference blob at the blob that holds the bytes
+REFERENCE_METADATA_KEY = "content_ref"
+# Blob metadata key holding the URL the document was fetched from
+SOURCE_URL_METADATA_KEY = "source_url"
+
+Entry = namedtuple("Entry", ["container", "blob_path", "source_url", "size", "sha256", "etag", "fetched_at", "reference"])
+
+
+def blob_metadata(source_url, sha256=None):
+    """Blob metadata that lets rebuild() recover a document's manifest entry from a listing."""
+    # Metadata values must be ASCII
+    metadata = {SOURCE_URL_METADATA_KEY: quote(source_url, safe=string.punctuation)}
+    if sha256:
+        metadata[DIGEST_METADATA_KEY] = sha256
+    return metadata
+
+
+class Manifest:
+    """
+    SQLite record of every document written to Blob Storage.
+
+    Scrapers consult it before downloading so known documents are skipped without a round trip
+    to the source or to Blob Storage, and the dedupe path uses its digests to find identical bytes.
+    It can be rebuilt from a container listing when the local file is lost.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "container TEXT, blob_path TEXT, source_url TEXT, size INTEGER, sha256 TEXT, etag TEXT, "
+            "fetched_at REAL, reference INTEGER DEFAULT 0, PRIMARY KEY (container, blob_path))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (container, sha256)")
+        self._conn.commit()
+
+    def get(self, container, blob_path):
+        """Return the Entry recorded for a blob, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(Entry._fields)} FROM documents WHERE container = ? AND blob_path = ?",
+                (container, blob_path),
+            ).fetchone()
+        return Entry(*row) if row else None
+
+    def is_stored(self, container, blob_path, source_url):
+        """True when the blob is recorded as holding the document fetched from source_url."""
+        entry = self.get(container, blob_path)
+        return entry is not None and entry.source_url == source_url
+
+    def digest_of(self, container, blob_path):
+        """Return the recorded digest of a blob, or None."""
+        entry = self.get(container, blob_path)
+        return entry.sha256 if entry else None
+
+    def find(self, container, sha256):
+        """Return the path of a blob in the container that already holds these bytes, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob_path FROM documents WHERE container = ? AND sha256 = ? AND reference = 0 LIMIT 1",
+                (container, sha256),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, container, blob_path, source_url=None, size=None, sha256=None, etag=None, reference=False,
+               fetched_at=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(container, blob_path, source_url, size, sha256, etag, fetched_at, reference) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (container, blob_path, source_url, size, sha256, etag, fetched_at or time.time(), int(reference)),
+            )
+            self._conn.commit()
+
+    def rebuild(self, container_client):
+        """
+        Replaces a container's entries with what a listing of the container reports.
+
+        Source URLs and digests come from the blob metadata written at upload time; blobs uploaded
+        before the manifest existed are recorded without them and are re-fetched once.
+        Documents packed into docket archives are recorded from their pack index, and zero-byte
+        "folder/" marker blobs are ignored.
+
+        :param container_client: Azure container client to list.
+        :return: Number of blobs recorded.
+        """
+        import packing
+        from storage import AzureStorage
+
+        blob_storage = AzureStorage(container_clients=[container_client])
+        rows = []
+        for blob in container_client.list_blobs(include=["metadata"]):
+            if blob.name.endswith("/"):
+                continue
+            prefix = packing.pack_prefix(blob.name)
+            if prefix is not None:
+                # Archive parts are not documents; their members are listed in the pack index
+                if packing.is_pack_index(blob.name):
+                    members = packing.load_index(blob_storage, container_client.container_name, prefix)
+                    fetched_at = blob.last_modified.timestamp() if blob.last_modified else None
+                    for path, entry in members.items():
+                        rows.append((
+                            container_client.container_name, path, entry["source_url"], entry["size"],
+                            entry["sha256"], blob.etag, fetched_at, 0,
+                        ))
+                continue
+            metadata = blob.metadata or {}
+            rows.append((
+                container_client.container_name,
+                blob.name,
+                metadata.get(SOURCE_URL_METADATA_KEY),
+                blob.size,
+                metadata.get(DIGEST_METADATA_KEY),
+                blob.etag,
+                blob.last_modified.timestamp() if blob.last_modified else None,
+                int(REFERENCE_METADATA_KEY in metadata),
+            ))
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE container = ?", (container_client.container_name,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents "
+                "(container, blob_path, source_url, size, sha256, etag, fetched_at, reference) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def counts(self):
+        """Return the number of recorded documents per container."""
+        with self._lock:
+            rows = self._conn.execute("SELECT container, COUNT(*) FROM documents GROUP BY container").fetchall()
+        return {container: count for container, count in rows}
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest():
+    """Return the process-wide document manifest."""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = Manifest()
+    return _manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the local manifest of stored documents.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Rebuild a container's entries from a blob listing")
+    rebuild_parser.add_argument("container")
+    rebuild_parser.add_argument("--connection-string", default=os.getenv("AZURE_STORAGE_CONNECTION_STRING"))
+    subparsers.add_parser("status", help="Show document counts per container")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    manifest = get_manifest()
+    if args.command == "rebuild":
+        from azure.storage.blob import BlobServiceClient
+
+        service = BlobServiceClient.from_connection_string(args.connection_string)
+        recorded = manifest.rebuild(service.get_container_client(args.container))
+        logging.info(f"Recorded {recorded} blobs from {args.container}")
+    logging.info(f"Manifest: {manifest.counts()}")
+
+
+if __name__ == "__main__":
+    main()
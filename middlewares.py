@@ -0,0 +1,52 @@
+import time
+from urllib.parse import urlsplit
+
+from scrapy import signals
+
+import politeness
+
+
+class PolitenessMiddleware:
+    """
+    Downloader middleware that feeds response latency and status codes to the per-host
+    politeness controller and applies its concurrency and delay to Scrapy's download slots.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.controller = politeness.get_controller()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def process_request(self, request, spider):
+        request.meta['politeness_start'] = time.monotonic()
+
+    def process_response(self, request, response, spider):
+        self._observe(request, response.status, response.headers.get('Retry-After'))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        # Timeouts and connection errors count as the host struggling
+        self._observe(request, None, None)
+
+    def _observe(self, request, status, retry_after):
+        host = urlsplit(request.url).netloc
+        start = request.meta.get('politeness_start')
+        latency = time.monotonic() - start if start is not None else None
+        if isinstance(retry_after, bytes):
+            retry_after = retry_after.decode('latin-1')
+        self.controller.observe(host, status, latency, retry_after)
+
+        slot = self.crawler.engine.downloader.slots.get(request.meta.get('download_slot'))
+        if slot is not None:
+            slot.delay = self.controller.delay(host)
+            slot.concurrency = self.controller.concurrency(host)
+
+    def spider_closed(self, spider):
+        for host, rate in self.controller.host_rates().items():
+            self.crawler.stats.set_value(f'politeness/{host}', rate)
+            spider.log(f"Politeness state for {host}: {rate}")
@@ -0,0 +1,229 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import tarfile
+import threading
+from itertools import chain
+
+from azure.core.exceptions import ResourceNotFoundError
+
+import http_client
+import manifest
+from blob_transfer import STREAM_BLOCK_SIZE, hashed_chunks, stream_to_blob
+
+# Packing configuration: small documents of a docket are batched into tar archives instead of one blob each
+PACK_MODE = os.getenv("PACK_MODE", "off")  # "off" or "small"
+PACK_MAX_MEMBER_SIZE = int(os.getenv("PACK_MAX_MEMBER_SIZE", str(256 * 1024)))  # Largest document packed, in bytes
+PACK_MAX_ARCHIVE_SIZE = int(os.getenv("PACK_MAX_ARCHIVE_SIZE", str(64 * 1024 * 1024)))  # Archive part size limit
+
+# Archives and their offset index live next to the docket's documents: <year>/<case_number>/_pack/
+PACK_DIRECTORY = "_pack"
+PACK_INDEX_NAME = "index.json"
+
+
+def index_path(prefix):
+    """Return the blob path of a docket's pack index."""
+    return posixpath.join(prefix, PACK_DIRECTORY, PACK_INDEX_NAME)
+
+
+def _read_index(storage, container, prefix):
+    try:
+        return json.loads(storage.download(container, index_path(prefix)))
+    except ResourceNotFoundError:
+        return {"members": {}}
+
+
+def load_index(storage, container, prefix):
+    """Return a docket's pack index as {member path: entry}; empty when nothing is packed."""
+    return _read_index(storage, container, prefix)["members"]
+
+
+def _part_number(archive_path):
+    return int(posixpath.splitext(posixpath.basename(archive_path))[0])
+
+
+def _build_archive(members):
+    """Tar the members in memory; return the archive bytes and each member's data offset."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    with tarfile.open(fileobj=buffer, mode="r") as archive:
+        offsets = {info.name: info.offset_data for info in archive.getmembers()}
+    return buffer.getvalue(), offsets
+
+
+class DocketPacker:
+    """
+    Batches a docket's small documents into tar archive parts with a sidecar JSON offset index.
+
+    Each flush writes a new part (<prefix>/_pack/00000.tar, 00001.tar, ...) and rewrites the index,
+    so later runs append parts instead of rewriting earlier archives. Part numbers are never
+    reused: the index records the next one, and parts whose members have all been repacked
+    into later parts are deleted. The index maps every member
+    path to its archive, data offset, size, SHA-256 and source URL, which is all a reader needs for
+    a single range request.
+    """
+
+    def __init__(self, storage, container, prefix, max_archive_size=None):
+        self.storage = storage
+        self.container = container
+        self.prefix = prefix
+        self.max_archive_size = max_archive_size or PACK_MAX_ARCHIVE_SIZE
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_size = 0
+        self._index = None
+        self._next_part = 0
+
+    def add(self, path, data, source_url):
+        """
+        Queue a document for the next archive part, flushing once the part is full.
+
+        A failed flush here keeps every queued document in the queue, so the final flush() retries
+        them and reports the failure for all of them if it fails again.
+        """
+        with self._lock:
+            self._pending.append((path, data, source_url))
+            self._pending_size += len(data)
+            if self._pending_size >= self.max_archive_size:
+                try:
+                    self._flush_locked()
+                except Exception as e:
+                    logging.warning(f"Error writing an archive part for {self.prefix}, retrying at the end: {e}")
+
+    def flush(self):
+        """Write queued documents as a new archive part and update the index; return members written."""
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return 0
+        if self._index is None:
+            data = _read_index(self.storage, self.container, self.prefix)
+            self._index = data["members"]
+            # Indexes written before next_part was recorded only know their referenced parts
+            parts = [_part_number(entry["archive"]) for entry in self._index.values()]
+            self._next_part = max([data.get("next_part", 0)] + [part + 1 for part in parts])
+        archive_path = posixpath.join(self.prefix, PACK_DIRECTORY, f"{self._next_part:05d}.tar")
+        self._next_part += 1
+        previous_archives = {entry["archive"] for entry in self._index.values()}
+
+        pending = self._pending
+        # Members are stored under their path relative to the docket
+        names = {path: posixpath.relpath(path, self.prefix) for path, _, _ in pending}
+        data, offsets = _build_archive([(names[path], body) for path, body, _ in pending])
+        members = dict(self._index)
+        for path, body, source_url in pending:
+            members[path] = {
+                "archive": archive_path,
+                "offset": offsets[names[path]],
+                "size": len(body),
+                "sha256": hashlib.sha256(body).hexdigest(),
+                "source_url": source_url,
+            }
+
+        # Nothing changes until the index points at the new part; on failure the queue stays as it was
+        etag = self.storage.upload(self.container, archive_path, data)
+        try:
+            index = {"members": members, "next_part": self._next_part}
+            self.storage.upload(self.container, index_path(self.prefix), json.dumps(index))
+        except Exception:
+            try:
+                self.storage.delete(self.container, archive_path)
+            except Exception:
+                pass
+            raise
+        self._index = members
+        self._pending, self._pending_size = [], 0
+
+        # Only members an index points to can be read back, so only they are recorded as stored
+        documents = manifest.get_manifest()
+        for path, body, source_url in pending:
+            documents.record(self.container, path, source_url, len(body), members[path]["sha256"], etag)
+        # Parts left without members once theirs were repacked are only deleted after the new index is up
+        referenced = {entry["archive"] for entry in self._index.values()}
+        for orphan in sorted(previous_archives - referenced):
+            try:
+                self.storage.delete(self.container, orphan)
+            except ResourceNotFoundError:
+                pass
+        return len(pending)
+
+
+def pack_or_transfer(packer, document_url, blob_client, max_member_size=None):
+    """
+    Downloads a document and queues it for the docket archive when it is small, else streams it to its own blob.
+
+    Only the first max_member_size + 1 bytes are buffered before deciding, so large documents are
+    still streamed block by block.
+
+    :return: "packed" or "uploaded".
+    """
+    max_member_size = max_member_size or PACK_MAX_MEMBER_SIZE
+    with http_client.get(document_url, stream=True) as response:
+        response.raise_for_status()
+        chunks = response.iter_content(STREAM_BLOCK_SIZE)
+        head = bytearray()
+        for chunk in chunks:
+            head += chunk
+            if len(head) > max_member_size:
+                break
+        else:
+            packer.add(blob_client.blob_name, bytes(head), document_url)
+            return "packed"
+
+        digest = hashlib.sha256(head)
+        size, etag = stream_to_blob(
+            chain([bytes(head)], hashed_chunks(chunks, digest)),
+            blob_client, metadata=manifest.blob_metadata(document_url),
+        )
+    manifest.get_manifest().record(
+        blob_client.container_name, blob_client.blob_name, document_url, size, digest.hexdigest(), etag
+    )
+    return "uploaded"
+
+
+def read_member(storage, container, entry):
+    """Fetch one packed document with a single range request, given its index entry."""
+    return storage.download(container, entry["archive"], entry["offset"], entry["size"])
+
+
+def iter_packed(storage, container, index_blob_name, suffixes=None):
+    """
+    Yields (member path, bytes) for the packed documents listed in a pack index blob.
+
+    :param index_blob_name: Blob path of a <prefix>/_pack/index.json, e.g. from a container listing.
+    :param suffixes: Optional name suffix or tuple of suffixes to keep, e.g. ".pdf".
+    """
+    for path, entry in load_index(storage, container, pack_prefix(index_blob_name)).items():
+        if suffixes is None or path.endswith(suffixes):
+            yield path, read_member(storage, container, entry)
+
+
+def is_pack_index(blob_name):
+    return blob_name.endswith(f"/{PACK_DIRECTORY}/{PACK_INDEX_NAME}")
+
+
+def pack_prefix(blob_name):
+    """Return the docket prefix of an archive or index blob under <prefix>/_pack/, or None for other blobs."""
+    prefix, _, rest = blob_name.rpartition(f"/{PACK_DIRECTORY}/")
+    return prefix if prefix and "/" not in rest else None
+
+
+def download_document(storage, container, path):
+    """Return a document's bytes whether it is stored as its own blob or packed in its docket's archive."""
+    try:
+        return storage.download(container, path)
+    except ResourceNotFoundError:
+        entry = load_index(storage, container, posixpath.dirname(path)).get(path)
+        if entry is None:
+            raise
+        return read_member(storage, container, entry)
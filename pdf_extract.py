@@ -0,0 +1,199 @@
+import io
+import logging
+import os
+import signal
+import time
+import tempfile
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from contextlib import contextmanager
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Older deployments only ship PyPDF2
+    from PyPDF2 import PdfReader
+
+# PDF extraction configuration
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))  # Extraction processes
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "32"))  # Pages per task when a document is split
+PDF_SPLIT_BYTES = int(os.getenv("PDF_SPLIT_BYTES", str(2 * 1024 * 1024)))  # Documents above this are split by page
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "120"))  # Seconds allowed per document
+
+
+class ExtractResult(namedtuple("ExtractResult", ["name", "pages", "error"])):
+    """Text of one document, one string per page; pages is None when extraction failed."""
+
+    def text(self, separator="\n"):
+        """Join the non-empty pages, as the indexers did page by page."""
+        return separator.join(page for page in self.pages or () if page)
+
+
+def _on_timeout(signum, frame):
+    raise TimeoutError("PDF extraction timed out")
+
+
+@contextmanager
+def _time_limit(timeout):
+    # The alarm frees the worker from a runaway document; the parent enforces the same budget
+    alarm = timeout and hasattr(signal, "setitimer")
+    if alarm:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _reader(source):
+    # Split documents arrive as a temp file path, others as their bytes
+    return PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _extract_range(source, start, stop, timeout):
+    """Worker task: extract pages [start, stop) of a PDF (stop None for all); return their texts."""
+    with _time_limit(timeout):
+        pages = _reader(source).pages
+        stop = len(pages) if stop is None else min(stop, len(pages))
+        return [pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+def _count_pages(source, timeout):
+    """Worker task: return the number of pages of a PDF."""
+    with _time_limit(timeout):
+        return len(_reader(source).pages)
+
+
+def page_count(data):
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PdfExtractor:
+    """
+    Extracts PDF text on a process pool.
+
+    Documents are fanned out one task each; documents larger than split_bytes are split into
+    page ranges of pages_per_task so a single large filing uses every worker. Split documents
+    are written to a temp file that the workers read, so each range task carries a path instead
+    of the whole PDF, and their pages are counted in a worker rather than in the parent. Results come
+    back in input order with pages reassembled in page order. A document that takes longer
+    than timeout seconds is reported as failed instead of stalling the run.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, workers=None, pages_per_task=None, split_bytes=None, timeout=None):
+        self.workers = workers or PDF_EXTRACT_WORKERS
+        self.pages_per_task = pages_per_task or PDF_PAGES_PER_TASK
+        self.split_bytes = PDF_SPLIT_BYTES if split_bytes is None else split_bytes
+        self.timeout = PDF_EXTRACT_TIMEOUT if timeout is None else timeout
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, name, data):
+        """Start extracting a document; return (name, future of its range task futures, temp file path)."""
+        ranges = Future()
+        if len(data) <= self.split_bytes:
+            ranges.set_result([self._executor.submit(_extract_range, data, 0, None, self.timeout)])
+            return name, ranges, None
+
+        handle, path = tempfile.mkstemp(prefix="pdf_extract_", suffix=".pdf")
+        with os.fdopen(handle, "wb") as f:
+            f.write(data)
+
+        def fan_out(counted):
+            # Runs once the page count is known; skipped when the document was given up on meanwhile
+            if not ranges.set_running_or_notify_cancel():
+                return
+            try:
+                count = counted.result()
+                ranges.set_result([
+                    self._executor.submit(_extract_range, path, start, start + self.pages_per_task, self.timeout)
+                    for start in range(0, count, self.pages_per_task)
+                ])
+            except Exception as e:
+                ranges.set_exception(e)
+
+        self._executor.submit(_count_pages, path, self.timeout).add_done_callback(fan_out)
+        return name, ranges, path
+
+    def _collect(self, name, ranges, path):
+        # The budget starts when the document is awaited, so time spent on earlier documents does not count
+        deadline = time.monotonic() + self.timeout
+        futures = []
+        pages = []
+        try:
+            futures = ranges.result(timeout=self.timeout)
+            for future in futures:
+                pages.extend(future.result(timeout=max(deadline - time.monotonic(), 0)))
+        except TimeoutError:
+            ranges.cancel()
+            for future in futures:
+                future.cancel()
+            logging.error(f"Timed out extracting {name} after {self.timeout:g}s")
+            return ExtractResult(name, None, "timeout")
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            logging.error(f"Error extracting {name}: {e}")
+            return ExtractResult(name, None, str(e))
+        finally:
+            if path is not None:
+                _remove(path)
+        return ExtractResult(name, pages, None)
+
+    def extract(self, documents):
+        """
+        Extracts documents in parallel.
+
+        :param documents: Iterable of (name, PDF bytes); consumed lazily, a few documents per worker ahead.
+        :yield: ExtractResult per document, in input order.
+        """
+        pending = deque()
+        try:
+            for name, data in documents:
+                pending.append(self._submit(name, data))
+                # Bounded lookahead keeps memory flat on large corpora
+                if len(pending) >= self.workers * 2:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            # Temp files of documents not collected, e.g. when the caller stops early
+            for _, _, path in pending:
+                if path is not None:
+                    _remove(path)
+
+
+def extract_pages(documents, **kwargs):
+    """
+    Extracts documents on a temporary process pool, yielding (name, page texts) in input order.
+
+    Documents that fail or time out are logged and skipped.
+    """
+    with PdfExtractor(**kwargs) as extractor:
+        for result in extractor.extract(documents):
+            if result.error is None:
+                yield result.name, result.pages
+
+
+def extract_texts(documents, separator="\n", **kwargs):
+    """Like extract_pages(), but yields (name, text) with the non-empty pages joined by separator."""
+    for name, pages in extract_pages(documents, **kwargs):
+        yield name, separator.join(page for page in pages if page)
@@ -1,53 +1,186 @@
 import os
-from azure.storage.blob import BlobServiceClient
+import time
+from collections import defaultdict
 from azure.mgmt.security import SecurityCenter
 from azure.mgmt.security.models import SecurityAssessment
 from azure.identity import DefaultAzureCredential
+from twisted.internet import reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+from frontier import DONE
+from scanning import ScanStage, get_scanner
+from storage import get_storage
 
 class AzureDefenderPipeline:
-    def __init__(self, blob_service_url, filtered_container, quarantine_container):
-        self.blob_service_client = BlobServiceClient.from_connection_string(blob_service_url)
+    def __init__(self, blob_service_url, filtered_container, quarantine_container, crawler=None,
+                 upload_workers=8, upload_queue_size=32, scan_backend='signature', scan_workers=4,
+                 storage_backend=None):
+        # Azure Blob Storage, or a local directory with STORAGE_BACKEND = 'local'
+        self.storage = get_storage(blob_service_url, storage_backend)
         self.filtered_container = filtered_container
         self.quarantine_container = quarantine_container
         self.security_client = SecurityCenter(credential=DefaultAzureCredential())
 
+        # Scans run on their own pool and identical files reuse the cached verdict
+        self.scan_stage = ScanStage(get_scanner(scan_backend))
+        self.scan_pool = ThreadPool(minthreads=1, maxthreads=scan_workers, name='malware-scan')
+
+        # Uploads run on their own thread pool so the reactor keeps downloading meanwhile
+        self.crawler = crawler
+        self.upload_pool = ThreadPool(minthreads=1, maxthreads=upload_workers, name='blob-upload')
+        self.upload_queue_size = upload_queue_size
+        self.pending_uploads = 0
+        self.paused = False
+        self.upload_stats = defaultdict(lambda: {'files': 0, 'bytes': 0, 'seconds': 0.0})
+        self.started_at = None
+
     @classmethod
     def from_crawler(cls, crawler):
         return cls(
             blob_service_url=crawler.settings.get('AZURE_BLOB_CONNECTION_STRING'),
             filtered_container=crawler.settings.get('FILTERED_CONTAINER'),
             quarantine_container=crawler.settings.get('QUARANTINE_CONTAINER'),
+            crawler=crawler,
+            upload_workers=crawler.settings.getint('UPLOAD_WORKERS', 8),
+            upload_queue_size=crawler.settings.getint('UPLOAD_QUEUE_SIZE', 32),
+            scan_backend=crawler.settings.get('SCAN_BACKEND', 'signature'),
+            scan_workers=crawler.settings.getint('SCAN_WORKERS', 4),
+            storage_backend=crawler.settings.get('STORAGE_BACKEND'),
+        )
+
+    def open_spider(self, spider):
+        self.scan_pool.start()
+        self.upload_pool.start()
+        self.started_at = time.monotonic()
+
+    def close_spider(self, spider):
+        self.scan_pool.stop()
+        self.upload_pool.stop()
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        scan_stats = self.scan_stage.stats
+        spider.log(
+            f"Scans with {self.scan_stage.scanner.name}: {scan_stats['scanned']} scanned "
+            f"({scan_stats['malicious']} malicious), {scan_stats['cache_hits']} cached verdicts, "
+            f"{scan_stats['scan_seconds']:.0f}s busy scan time"
         )
+        for container, stats in self.upload_stats.items():
+            # busy seconds above wall-clock seconds means uploads ran in parallel with each other and the crawl
+            spider.log(
+                f"Uploads to {container}: {stats['files']} files, {stats['bytes'] / 1e6:.1f} MB, "
+                f"{stats['bytes'] / 1e6 / elapsed:.2f} MB/s over {elapsed:.0f}s wall clock, "
+                f"{stats['seconds']:.0f}s busy upload time"
+            )
 
-    def scan_file_with_azure_defender(self, file_path):
-        # Simulate Azure Defender scan (mocked here)
-        # Replace with real Defender API integration for file scanning
-        if 'bad' in file_path:  # Assume files with "bad" are malicious
-            return False
-        return True
+    def scan_file(self, item):
+        # Runs on the scan thread pool
+        if 'file_body' in item:
+            return self.scan_stage.scan(item['file_body'], item['file_name'])
+        if 'file_handle' in item:
+            return self.scan_stage.scan(item['file_handle'], item['file_name'])
+        with open(item['file_path'], 'rb') as f:
+            return self.scan_stage.scan(f, item['file_name'])
 
     def upload_to_blob(self, container_name, file_path, file_name):
-        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=file_name)
         with open(file_path, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
-        return blob_client.url
+            return self.upload_data_to_blob(container_name, data, file_name)
 
-    def process_item(self, item, spider):
-        file_path = item['file_path']
+    def upload_data_to_blob(self, container_name, data, file_name):
+        return self.storage.upload(container_name, file_name, data)
+
+    def _upload_and_clean_up(self, container_name, item):
+        # Runs on the upload thread pool
         file_name = item['file_name']
-        
-        # Scan with Azure Defender
-        is_clean = self.scan_file_with_azure_defender(file_path)
-        
-        if is_clean:
-            # Upload to filtered container
-            self.upload_to_blob(self.filtered_container, file_path, file_name)
-            spider.log(f"Uploaded clean file: {file_name}")
+        start = time.monotonic()
+        if 'file_body' in item:
+            # Small files are handed over in memory and never touch the disk
+            size = len(item['file_body'])
+            self.upload_data_to_blob(container_name, item['file_body'], file_name)
+        elif 'file_handle' in item:
+            # Large files were spooled to an anonymous temp file once; closing it deletes it
+            with item['file_handle'] as handle:
+                handle.seek(0)
+                size = os.fstat(handle.fileno()).st_size
+                self.upload_data_to_blob(container_name, handle, file_name)
         else:
-            # Upload to quarantine container
-            self.upload_to_blob(self.quarantine_container, file_path, file_name)
+            file_path = item['file_path']
+            size = os.path.getsize(file_path)
+            try:
+                self.upload_to_blob(container_name, file_path, file_name)
+            finally:
+                # Clean up local files
+                os.remove(file_path)
+        return size, time.monotonic() - start
+
+    def _route(self, verdict, item, spider):
+        # Clean files go to the filtered container, malicious ones to quarantine
+        if verdict.clean:
+            container_name = self.filtered_container
+        else:
+            container_name = self.quarantine_container
+            spider.log(f"{verdict.scanner} scan flagged {item['file_name']}: {verdict.detail}")
+        if self.crawler:
+            self.crawler.stats.inc_value('scan/cache_hits' if verdict.cached else 'scan/scanned')
+        d = threads.deferToThreadPool(
+            reactor, self.upload_pool, self._upload_and_clean_up, container_name, item
+        )
+        d.addCallback(self._uploaded, item, spider, container_name, item['file_name'])
+        return d
+
+    def _uploaded(self, result, item, spider, container_name, file_name):
+        size, seconds = result
+        stats = self.upload_stats[container_name]
+        stats['files'] += 1
+        stats['bytes'] += size
+        stats['seconds'] += seconds
+        if self.crawler:
+            self.crawler.stats.inc_value(f'upload/{container_name}/files')
+            self.crawler.stats.inc_value(f'upload/{container_name}/bytes', size)
+        if container_name == self.quarantine_container:
             spider.log(f"Uploaded malicious file to quarantine: {file_name}")
-        
-        # Clean up local files
-        os.remove(file_path)
+        else:
+            spider.log(f"Uploaded clean file: {file_name}")
+        return item
+
+    def _release_slot(self, result):
+        self.pending_uploads -= 1
+        if self.paused and self.pending_uploads < self.upload_queue_size:
+            self.crawler.engine.unpause()
+            self.paused = False
+        return result
+
+    def process_item(self, item, spider):
+        # Backpressure: stop scheduling downloads while the scan and upload queue is full
+        self.pending_uploads += 1
+        if self.crawler and not self.paused and self.pending_uploads >= self.upload_queue_size:
+            spider.log(f"Upload queue full ({self.pending_uploads}), pausing the crawl")
+            self.crawler.engine.pause()
+            self.paused = True
+            self.crawler.stats.inc_value('upload/backpressure_pauses')
+
+        # Scan, then upload to the container the verdict picks
+        d = threads.deferToThreadPool(reactor, self.scan_pool, self.scan_file, item)
+        d.addCallback(self._route, item, spider)
+        d.addCallbacks(self._stored, self._not_stored, callbackArgs=(spider,), errbackArgs=(item, spider))
+        d.addCallback(self._drop_body)
+        d.addBoth(self._release_slot)
+        return d
+
+    def _stored(self, item, spider):
+        # Only now is the spider's download done; a crash before this refetches it on resume
+        frontier = getattr(spider, 'frontier', None)
+        if frontier is not None and 'frontier_key' in item:
+            frontier.mark(*item['frontier_key'], DONE)
+        return item
+
+    def _not_stored(self, failure, item, spider):
+        frontier = getattr(spider, 'frontier', None)
+        if frontier is not None and 'frontier_key' in item:
+            frontier.fail(*item['frontier_key'])
+        return failure
+
+    def _drop_body(self, item):
+        # Keep uploaded bodies out of later pipelines and feed exports
+        item.pop('file_body', None)
+        item.pop('file_handle', None)
+        item.pop('frontier_key', None)
         return item
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# AIMD controller configuration
+POLITENESS_INITIAL_CONCURRENCY = float(os.getenv("POLITENESS_INITIAL_CONCURRENCY", "2"))
+POLITENESS_MIN_CONCURRENCY = float(os.getenv("POLITENESS_MIN_CONCURRENCY", "1"))
+POLITENESS_MAX_CONCURRENCY = float(os.getenv("POLITENESS_MAX_CONCURRENCY", "16"))
+POLITENESS_TARGET_LATENCY = float(os.getenv("POLITENESS_TARGET_LATENCY", "2.0"))  # Seconds to first byte
+POLITENESS_BACKOFF_FACTOR = float(os.getenv("POLITENESS_BACKOFF_FACTOR", "0.5"))  # Multiplicative decrease
+POLITENESS_MIN_BACKOFF_DELAY = float(os.getenv("POLITENESS_MIN_BACKOFF_DELAY", "0.5"))  # Delay after the first error
+POLITENESS_MAX_DELAY = float(os.getenv("POLITENESS_MAX_DELAY", "60"))
+WEBSITES_CONFIG = os.getenv("WEBSITES_CONFIG", "websites.json")
+
+# Responses treated as the server asking us to slow down
+BACKOFF_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header as seconds from now, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+    def __init__(self, concurrency, delay, max_concurrency):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.base_delay = delay
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.next_allowed = 0.0
+        self.latency = None
+        self.requests = 0
+        self.errors = 0
+        self.last_status = None
+        self.retry_after_until = 0.0
+
+    def snapshot(self):
+        now = time.monotonic()
+        # Achievable request rate is bounded by both the concurrency window and the request spacing
+        per_request = max(self.delay, (self.latency or 0.0) / max(self.concurrency, 1.0))
+        return {
+            "concurrency": round(self.concurrency, 2),
+            "delay": round(self.delay, 3),
+            "in_flight": self.in_flight,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "requests_per_second": round(1.0 / per_request, 2) if per_request else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "last_status": self.last_status,
+            "retry_after_remaining": round(max(0.0, self.retry_after_until - now), 1),
+        }
+
+
+class PolitenessController:
+    """
+    Per-host AIMD concurrency and delay controller.
+
+    Successful responses under the target latency grow a host's concurrency additively (about one
+    slot per window) and shrink its delay back toward the configured base. 429/5xx responses and
+    connection errors halve the concurrency and double the delay, and Retry-After holds off
+    the host until the server's deadline.
+    """
+
+    def __init__(self):
+        self._hosts = {}
+        self._overrides = {}
+        self._condition = threading.Condition()
+
+    def configure_host(self, host, max_concurrency=None, delay=None):
+        """Set per-host limits, e.g. from a websites.json entry."""
+        with self._condition:
+            self._overrides[host] = {"max_concurrency": max_concurrency, "delay": delay}
+            self._hosts.pop(host, None)
+
+    def load_sites(self, path=WEBSITES_CONFIG):
+        """Register every host in websites.json, honouring optional max_concurrency/delay keys."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                websites = json.load(f)
+        except ValueError as e:
+            logging.warning(f"Could not read site limits from {path}: {e}")
+            return
+        for site in websites:
+            host = urlsplit(site["url"]).netloc
+            self.configure_host(host, site.get("max_concurrency"), site.get("delay"))
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            override = self._overrides.get(host, {})
+            max_concurrency = override.get("max_concurrency") or POLITENESS_MAX_CONCURRENCY
+            state = HostState(
+                min(POLITENESS_INITIAL_CONCURRENCY, max_concurrency),
+                override.get("delay") or 0.0,
+                max_concurrency,
+            )
+            self._hosts[host] = state
+        return state
+
+    def acquire(self, host):
+        """Block until the host has a free concurrency slot and its delay has elapsed."""
+        with self._condition:
+            state = self._state(host)
+            while True:
+                now = time.monotonic()
+                wait = state.next_allowed - now
+                if state.in_flight < max(1, int(state.concurrency)) and wait <= 0:
+                    break
+                self._condition.wait(timeout=wait if wait > 0 else None)
+            state.in_flight += 1
+            state.next_allowed = now + state.delay
+
+    def release(self, host, status, latency, retry_after=None):
+        """Free the slot taken by acquire and feed the outcome to the controller."""
+        with self._condition:
+            self._state(host).in_flight -= 1
+            self._observe(host, status, latency, retry_after)
+            self._condition.notify_all()
+
+    def observe(self, host, status, latency, retry_after=None):
+        """Feed an outcome for a request whose concurrency is managed elsewhere (e.g. by Scrapy)."""
+        with self._condition:
+            self._observe(host, status, latency, retry_after)
+            self._condition.notify_all()
+
+    def _observe(self, host, status, latency, retry_after):
+        state = self._state(host)
+        now = time.monotonic()
+        state.requests += 1
+        state.last_status = status
+
+        if status is None or status in BACKOFF_STATUSES:
+            state.errors += 1
+            state.concurrency = max(POLITENESS_MIN_CONCURRENCY, state.concurrency * POLITENESS_BACKOFF_FACTOR)
+            state.delay = min(POLITENESS_MAX_DELAY, max(state.delay * 2, POLITENESS_MIN_BACKOFF_DELAY))
+            seconds = parse_retry_after(retry_after)
+            if seconds:
+                state.retry_after_until = max(state.retry_after_until, now + seconds)
+                state.next_allowed = max(state.next_allowed, state.retry_after_until)
+            logging.info(f"Backing off {host} after status {status}: {state.snapshot()}")
+            return
+
+        if latency is not None:
+            state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+        if state.latency is None or state.latency <= POLITENESS_TARGET_LATENCY:
+            state.concurrency = min(state.max_concurrency, state.concurrency + 1.0 / state.concurrency)
+            state.delay = max(state.base_delay, state.delay * 0.9)
+
+    def delay(self, host):
+        with self._condition:
+            state = self._state(host)
+            return max(state.delay, state.retry_after_until - time.monotonic())
+
+    def concurrency(self, host):
+        with self._condition:
+            return max(1, int(self._state(host).concurrency))
+
+    def host_rates(self):
+        """Current concurrency, delay, latency and request rate per host."""
+        with self._condition:
+            return {host: state.snapshot() for host, state in sorted(self._hosts.items())}
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """Return the process-wide controller, seeded from websites.json."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                controller = PolitenessController()
+                controller.load_sites()
+                _controller = controller
+    return _controller
+
+
+def host_rates():
+    return get_controller().host_rates()
@@ -1,23 +1,29 @@
             #    Logging configuration
+import logging
+import os
+
+from storage import get_storage
+import jsonl_stream
+from vector_shards import MANIFEST_NAME, VectorShardReader, is_shard_file
+
+# Containers are read through the storage backend (Azure Blob Storage, or a local mirror with STORAGE_BACKEND=local)
+storage = get_storage(os.getenv("AZURE_STORAGE_CONNECTION_STRING"))
+CITATIONS_CONTAINER_NAME = os.getenv("CITATIONS_CONTAINER_NAME", "ky-citations-filename-embeddings")
+DATA_CONTAINER_NAME = os.getenv("DATA_CONTAINER_NAME")
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def stream_jsonl(blob_client):
+def stream_jsonl(container, blob_name):
     """
     Streams JSONL files line-by-line to efficiently process large datasets without loading them entirely into memory.
 
-    :param blob_client: Azure Blob Storage client for the JSONL file.
+    :param container: Container holding the JSONL file.
+    :param blob_name: Path of the JSONL file in the container.
     :yield: Each JSON object in the file.
     """
-    stream = blob_client.download_blob().chunks()
-    buffer = ""
-    for chunk in stream:
-        buffer += chunk.decode('utf-8')
-        lines = buffer.split('\n')
-        buffer = lines.pop()  # Keep incomplete line for next chunk
-        for line in lines:
-            if line.strip():
-                yield json.loads(line)
+    # Lines are split as bytes and decoded whole, so long embedding lines stay linear-time
+    yield from jsonl_stream.stream_jsonl(storage.stream(container, blob_name))
 
 
 def load_citation_dict():
@@ -27,11 +33,9 @@ def load_citation_dict():
     :return: Dictionary of citation metadata indexed by filename.
     """
     citation_dict = {}
-    for blob in citation_container_client.list_blobs():
-        if blob.name.endswith(".json"):
-            blob_client = citation_container_client.get_blob_client(blob.name)
-            for item in stream_jsonl(blob_client):
-                citation_dict[item['filename']] = item
+    for blob in storage.list(CITATIONS_CONTAINER_NAME, suffixes=".json"):
+        for item in stream_jsonl(CITATIONS_CONTAINER_NAME, blob.name):
+            citation_dict[item['filename']] = item
     return citation_dict
 
 
@@ -44,27 +48,33 @@ def load_data_embeddings_batchwise(batch_size=100):
     """
     logging.info("Streaming and processing data embeddings batch-wise using JSONL...")
    
-    blob_list = [
-        blob.name for blob in data_container_client.list_blobs() if blob.name.endswith(".jsonl")  # Using JSONL format
-    ]
-
-    if not blob_list:
-        logging.warning("No data embedding JSON files found in the container.")
-        return
-
-    logging.info(f"Total JSON files found in the container: {len(blob_list)}")
-
-    for blob_name in blob_list:
+    # Blobs are processed as the parallel listing finds them instead of after a full listing
+    blob_count = 0
+    for blob in storage.list(DATA_CONTAINER_NAME, suffixes=(".jsonl", "/" + MANIFEST_NAME)):  # JSONL or vector shards
+        blob_name = blob.name
+        # Shard metadata sidecars are read through their store's manifest
+        if is_shard_file(blob_name):
+            continue
+        blob_count += 1
         logging.info(f"Processing blob: {blob_name}")
-        data_blob_client = data_container_client.get_blob_client(blob_name)
 
         try:
+            if blob_name.endswith("/" + MANIFEST_NAME):
+                # Shard stores are memory-mapped one shard at a time
+                items = VectorShardReader(storage, DATA_CONTAINER_NAME, blob_name[:-len(MANIFEST_NAME) - 1])
+            else:
+                items = stream_jsonl(DATA_CONTAINER_NAME, blob_name)
             # Yield each item directly (not using Pandas DataFrame for simplicity)
-            for embedding_item in stream_jsonl(data_blob_client):
+            for embedding_item in items:
                 yield embedding_item
         except Exception as e:
             logging.error(f"Error processing blob {blob_name}: {e}")
 
+    if not blob_count:
+        logging.warning("No data embedding JSON files found in the container.")
+    else:
+        logging.info(f"Total JSON files found in the container: {blob_count}")
+
 
 def index_embeddings(data_embeddings_generator, citation_dict):
     """
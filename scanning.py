@@ -0,0 +1,264 @@
+import abc
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Malware scan configuration
+SCAN_BACKEND = os.getenv("SCAN_BACKEND", "signature")  # Registered scanner used by the scan stage
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))  # Documents scanned in parallel
+SCAN_CACHE_PATH = os.getenv("SCAN_CACHE_PATH", "scan_verdicts.db")  # Verdict cache keyed by content hash
+SCAN_SIGNATURES_PATH = os.getenv("SCAN_SIGNATURES_PATH")  # Optional extra signatures, one "name:hex bytes" per line
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+# The industry-standard antivirus test string, detected by every scanner
+EICAR_SIGNATURE = rb"X5O!P%@AP[4\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+
+ScanResult = namedtuple("ScanResult", ["clean", "scanner", "detail", "cached"])
+
+
+def _chunks(source, chunk_size=SCAN_CHUNK_SIZE):
+    """Yield the bytes of a document given as bytes or a binary file object (read from the start)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        for start in range(0, len(source), chunk_size):
+            yield bytes(source[start:start + chunk_size])
+        return
+    source.seek(0)
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        yield chunk
+
+
+class Scanner(abc.ABC):
+    """
+    A malware scanner backend; name and version identify its verdicts in the cache.
+
+    version should change whenever the scanner could reach a different verdict on the same bytes
+    (new signatures or engine), so cached verdicts of the old version are not trusted.
+    """
+
+    name = None
+    version = None
+    # Verdicts of scanners that look at the bytes can be cached by content hash
+    content_based = True
+
+    @property
+    def cache_key(self):
+        """Name under which verdicts are cached, e.g. signature@3f2a91c0d4e5b6a7."""
+        return self.name if self.version is None else f"{self.name}@{self.version}"
+
+    @abc.abstractmethod
+    def scan(self, chunks, file_name):
+        """Scan a document's bytes, given as an iterable of chunks; return (clean, detail)."""
+
+
+class SignatureScanner(Scanner):
+    """
+    Local scanner that matches byte signatures in a single pass over the document.
+
+    Ships with the EICAR test signature, so quarantine routing can be exercised offline with the
+    standard test file; more signatures can be loaded from SCAN_SIGNATURES_PATH.
+    """
+
+    name = "signature"
+
+    def __init__(self, signatures=None, signatures_path=SCAN_SIGNATURES_PATH):
+        signatures = dict(signatures or {"Eicar-Test-Signature": EICAR_SIGNATURE})
+        if signatures_path:
+            with open(signatures_path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        signature_name, _, hex_bytes = line.partition(":")
+                        signatures[signature_name] = bytes.fromhex(hex_bytes)
+        # Loading or changing a signature changes the version, which retires cached verdicts
+        digest = hashlib.sha256()
+        for signature_name, pattern in sorted(signatures.items()):
+            digest.update(f"{signature_name}:{pattern.hex()}\n".encode("utf-8"))
+        self.version = digest.hexdigest()[:16]
+        # Different names for the same bytes are fine: the first one found is reported
+        self._names = {pattern: signature_name for signature_name, pattern in reversed(list(signatures.items()))}
+        self._pattern = re.compile(b"|".join(re.escape(pattern) for pattern in self._names))
+        # Signatures can straddle chunk boundaries, so each chunk is searched with the tail of the last
+        self._overlap = max(len(pattern) for pattern in self._names) - 1
+
+    def scan(self, chunks, file_name):
+        tail = b""
+        for chunk in chunks:
+            window = tail + chunk
+            match = self._pattern.search(window)
+            if match:
+                return False, self._names[match.group(0)]
+            tail = window[-self._overlap:] if self._overlap else b""
+        return True, None
+
+
+class FileNameScanner(Scanner):
+    """The original placeholder check: files with "bad" in their name are treated as malicious."""
+
+    name = "file-name"
+    content_based = False
+
+    def scan(self, chunks, file_name):
+        if 'bad' in file_name:
+            return False, "file name"
+        return True, None
+
+
+# Scanner backends by name; register others (e.g. an Azure Defender client) with register_scanner
+_scanners = {
+    SignatureScanner.name: SignatureScanner,
+    FileNameScanner.name: FileNameScanner,
+}
+
+
+def register_scanner(name, factory):
+    """Register a factory that builds a Scanner for SCAN_BACKEND=name."""
+    _scanners[name] = factory
+
+
+def get_scanner(name=SCAN_BACKEND):
+    if name not in _scanners:
+        raise ValueError(f"Unsupported scanner backend: {name}")
+    return _scanners[name]()
+
+
+class VerdictCache:
+    """
+    SQLite cache of scan verdicts keyed by SHA-256 and scanner cache key, so identical files are scanned once.
+
+    The scanner cache key includes its version, so a file cached as clean is scanned again once
+    the scanner's signatures change.
+    """
+
+    def __init__(self, path=SCAN_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "sha256 TEXT, scanner TEXT, clean INTEGER, detail TEXT, scanned_at REAL, PRIMARY KEY (sha256, scanner))"
+        )
+        self._conn.commit()
+
+    def get(self, sha256, scanner):
+        """Return (clean, detail) for a digest, or None when it has not been scanned."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT clean, detail FROM verdicts WHERE sha256 = ? AND scanner = ?", (sha256, scanner)
+            ).fetchone()
+        return (bool(row[0]), row[1]) if row else None
+
+    def record(self, sha256, scanner, clean, detail):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (sha256, scanner, clean, detail, scanned_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, scanner, int(clean), detail, time.time()),
+            )
+            self._conn.commit()
+
+    def prune(self, scanner):
+        """Delete the verdicts of a scanner's other versions; return how many were deleted."""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM verdicts WHERE (scanner = ? OR scanner LIKE ?) AND scanner != ?",
+                (scanner.name, f"{scanner.name}@%", scanner.cache_key),
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+
+class ScanStage:
+    """
+    Scans documents with a pluggable scanner, consulting the verdict cache first.
+
+    scan() is thread-safe and meant to be called from a worker pool (the pipeline's scan pool, or
+    scan_many()). Verdicts of scanners that do not look at content are never cached.
+    """
+
+    def __init__(self, scanner=None, cache=None):
+        self.scanner = scanner or get_scanner()
+        self.cache = cache if cache is not None else VerdictCache()
+        if self.scanner.content_based:
+            pruned = self.cache.prune(self.scanner)
+            if pruned:
+                logging.info(f"Dropped {pruned} cached verdicts of earlier {self.scanner.name} versions")
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def _bump(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def scan(self, source, file_name):
+        """
+        Scans one document.
+
+        :param source: Document bytes or a seekable binary file object.
+        :param file_name: Name of the document, for name-based scanners and logs.
+        :return: ScanResult(clean, scanner, detail, cached).
+        """
+        start = time.monotonic()
+        cacheable = self.scanner.content_based
+        sha256 = None
+        if cacheable:
+            digest = hashlib.sha256()
+            for chunk in _chunks(source):
+                digest.update(chunk)
+            sha256 = digest.hexdigest()
+            if hasattr(source, "seek"):
+                source.seek(0)
+            verdict = self.cache.get(sha256, self.scanner.cache_key)
+            if verdict is not None:
+                self._bump("cache_hits")
+                return ScanResult(verdict[0], self.scanner.name, verdict[1], True)
+
+        clean, detail = self.scanner.scan(_chunks(source), file_name)
+        if hasattr(source, "seek"):
+            # Leave file objects ready for the upload
+            source.seek(0)
+        if cacheable:
+            self.cache.record(sha256, self.scanner.cache_key, clean, detail)
+        self._bump("scanned")
+        self._bump("clean" if clean else "malicious")
+        self._bump("scan_seconds", time.monotonic() - start)
+        return ScanResult(clean, self.scanner.name, detail, False)
+
+    def scan_many(self, documents, workers=SCAN_WORKERS):
+        """Scan (source, file_name) pairs on a worker pool; return ScanResults in input order."""
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as executor:
+            return list(executor.map(lambda document: self.scan(*document), documents))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan local files with the configured scanner backend.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--backend", default=SCAN_BACKEND)
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    stage = ScanStage(get_scanner(args.backend))
+    documents = []
+    for path in args.paths:
+        with open(path, "rb") as f:
+            documents.append((f.read(), os.path.basename(path)))
+
+    start = time.monotonic()
+    results = stage.scan_many(documents, args.workers)
+    elapsed = max(time.monotonic() - start, 1e-9)
+    for path, result in zip(args.paths, results):
+        verdict = "clean" if result.clean else f"malicious ({result.detail})"
+        logging.info(f"{path}: {verdict}{' [cached]' if result.cached else ''}")
+    total = sum(len(data) for data, _ in documents)
+    logging.info(f"Scanned {len(documents)} files, {total / 1e6:.1f} MB in {elapsed:.2f}s "
+                 f"({total / 1e6 / elapsed:.1f} MB/s), {stage.stats['cache_hits']} cache hits")
+
+
+if __name__ == "__main__":
+    main()
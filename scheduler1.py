@@ -3,12 +3,14 @@ from pydantic import BaseModel
 import os
 import re
 import requests
-from bs4 import BeautifulSoup
+from link_extractor import find_document_links
 from azure.storage.blob import BlobServiceClient
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
+from async_fetcher import fetch_documents
+import validator_store
 
 # Initialize FastAPI
 app = FastAPI()
@@ -37,33 +39,37 @@ def get_case_number_from_url(url):
     match = re.search(r"(\d{4}-\d{5})", url)
     return match.group(1) if match else "unknown_case"
 
-def download_and_upload_document(document_url, year, case_number, document_name):
-    try:
-        response = requests.get(document_url, stream=True)
-        response.raise_for_status()
-
-        blob_client = container_client.get_blob_client(blob=f"{year}/{case_number}/{document_name}")
-        blob_client.upload_blob(response.content, overwrite=True)
-        print(f"Uploaded {document_name} to {year}/{case_number} in Azure Blob Storage.")
-    except Exception as e:
-        print(f"Failed to process {document_url}: {e}")
-
 def scrape_case_documents(url):
     year = get_year_from_url(url)
     case_number = get_case_number_from_url(url)
 
     try:
-        response = requests.get(url)
-        response.raise_for_status()
+        # Revalidate the case page; unchanged pages skip parsing entirely
+        page = validator_store.fetch_page(url)
+        if not page.changed:
+            print(f"Skipping {url}: unchanged since last run.")
+            return
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        document_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx|txt|xls)$'))
+        document_links = find_document_links(page.response.text, r'\.(pdf|docx|txt|xls)$')
 
+        documents = []
         for link in document_links:
-            document_url = link['href']
-            document_name = link.text.strip() or document_url.split('/')[-1]
+            document_url = link.href
+            document_name = link.text or document_url.split('/')[-1]
             full_document_url = requests.compat.urljoin(url, document_url)
-            download_and_upload_document(full_document_url, year, case_number, document_name)
+            documents.append({"document_url": full_document_url, "path": f"{year}/{case_number}/{document_name}"})
+
+        failed = 0
+        for result in fetch_documents(container_client, documents):
+            if result["status"] == "error":
+                failed += 1
+                print(f"Failed to process {result['document_url']}: {result['error']}")
+            else:
+                print(f"{result['status'].capitalize()} {result['path']} in Azure Blob Storage.")
+
+        # Only remember the page once every document made it, so failures are retried next run
+        if not failed:
+            validator_store.record_page(page)
     except Exception as e:
         print(f"Error while scraping {url}: {e}")
 
@@ -78,8 +84,10 @@ scheduler = BackgroundScheduler()
 
 def scheduled_scraping_job():
     urls = ["<URL_1>", "<URL_2>"]  # Replace with your target URLs
+    start = validator_store.run_summary()
     for url in urls:
         scrape_case_documents(url)
+    print(f"Scheduled scraping completed. Pages: {validator_store.run_summary(since=start)}")
 
 scheduler.add_job(scheduled_scraping_job, CronTrigger(hour=0, minute=0))
 scheduler.start()
@@ -1,8 +1,10 @@
 import os
 import re
 import requests
-from bs4 import BeautifulSoup
+import http_client
+from link_extractor import find_document_links
 from azure.storage.blob import BlobServiceClient
+from blob_transfer import transfer_document
 
 # Azure Blob Storage configuration
 AZURE_CONNECTION_STRING = "<AZURE_CONNECTION_STRING>"  # Replace with your Azure connection string
@@ -20,13 +22,9 @@ def get_docket_number_from_url(url):
 def download_and_upload_document(document_url, folder_name, document_name):
     """Download a document and upload it to Azure Blob Storage."""
     try:
-        # Download the document
-        response = requests.get(document_url, stream=True)
-        response.raise_for_status()
-
-        # Upload the document to Azure Blob Storage
         blob_client = container_client.get_blob_client(blob=f"{folder_name}/{document_name}")
-        blob_client.upload_blob(response.content, overwrite=True)
+        # Stream the document into the blob block by block
+        transfer_document(document_url, blob_client)
         print(f"Uploaded {document_name} to folder {folder_name} in Azure Blob Storage.")
     except Exception as e:
         print(f"Failed to process {document_url}: {e}")
@@ -37,18 +35,15 @@ def scrape_documents(url):
     
     try:
         # Fetch the webpage content
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
 
-        # Parse the webpage
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find all links with .pdf or .docx
-        document_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx)$'))
+        # Find all document links in a single pass over the page
+        document_links = find_document_links(response.text, r'\.(pdf|docx)$')
         
         for link in document_links:
-            document_url = link['href']
-            document_name = link.text.strip() or document_url.split('/')[-1]
+            document_url = link.href
+            document_name = link.text or document_url.split('/')[-1]
             full_document_url = requests.compat.urljoin(url, document_url)
 
             # Download and upload each document
@@ -8,3 +8,31 @@ ROBOTSTXT_OBEY = True
 ITEM_PIPELINES = {
     'scrapy_aks_crawler.pipelines.AzureBlobPipeline': 300,
 }
+
+# Adaptive per-host concurrency and delay (see politeness.py); sites may set
+# optional "max_concurrency" and "delay" keys in websites.json
+DOWNLOADER_MIDDLEWARES = {
+    'scrapy_aks_crawler.middlewares.PolitenessMiddleware': 590,
+}
+
+# Persistent crawl frontier (see frontier.py); keep FRONTIER_PATH on a volume that survives pod restarts
+FRONTIER_PATH = 'crawl_state/frontier.db'
+FRONTIER_RESUME = True
+FRONTIER_CHECKPOINT_INTERVAL = 30  # Seconds between frontier commits
+
+# Blob uploads run on a bounded thread pool; the crawl pauses while UPLOAD_QUEUE_SIZE uploads are pending
+UPLOAD_WORKERS = 8
+UPLOAD_QUEUE_SIZE = 32
+
+# FilingsSpider hands downloaded files to the pipeline in memory ('memory') or via downloads/ ('disk');
+# in memory mode files above HANDOFF_MEMORY_LIMIT bytes are written once to an anonymous temp file
+HANDOFF_MODE = 'memory'
+HANDOFF_MEMORY_LIMIT = 8 * 1024 * 1024
+
+# Malware scan stage (see scanning.py): backend 'signature' (local, EICAR and SCAN_SIGNATURES_PATH) or
+# 'file-name' (the old placeholder); verdicts are cached by content hash in SCAN_CACHE_PATH
+SCAN_BACKEND = 'signature'
+SCAN_WORKERS = 4
+
+# Storage backend for uploads (see storage.py): 'azure', or 'local' to write under STORAGE_LOCAL_ROOT
+STORAGE_BACKEND = 'azure'
@@ -0,0 +1,264 @@
+import abc
+import io
+import json
+import mmap
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+from manifest import REFERENCE_METADATA_KEY
+
+# Storage backend configuration
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure")  # "azure" or "local"
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "local_storage")  # One directory per container
+STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", str(4 * 1024 * 1024)))  # Bytes per streamed chunk
+
+# Listing entries carry the same attributes as Azure's BlobProperties
+BlobEntry = namedtuple("BlobEntry", ["name", "size", "etag", "last_modified", "metadata"])
+
+
+class Storage(abc.ABC):
+    """
+    Blob storage used by the pipelines and indexers, addressed by container and blob path.
+
+    Reads follow reference blobs written by the dedupe "reference" mode (see blob_transfer.py),
+    so callers always get the document's bytes. Missing blobs raise ResourceNotFoundError on
+    every backend.
+    """
+
+    @abc.abstractmethod
+    def ensure_container(self, container):
+        pass
+
+    @abc.abstractmethod
+    def upload(self, container, path, data, metadata=None):
+        """Write bytes, str or a binary file object to a blob, replacing it; return the new ETag."""
+
+    @abc.abstractmethod
+    def list(self, container, suffixes=None):
+        """Yield a BlobEntry (or BlobProperties) per blob, optionally only names ending in suffixes."""
+
+    @abc.abstractmethod
+    def download(self, container, path, offset=None, length=None):
+        """Return a blob's bytes, or length bytes from offset."""
+
+    @abc.abstractmethod
+    def stream(self, container, path, chunk_size=None):
+        """Yield a blob's bytes in chunks."""
+
+    def open(self, container, path):
+        """
+        Return a seekable binary file object over a blob, e.g. for PdfReader.
+
+        The caller owns the object and must close it, e.g. with a with statement: on LocalStorage
+        it is a memory map of the file, which stays mapped until closed.
+        """
+        return io.BytesIO(self.download(container, path))
+
+    @abc.abstractmethod
+    def delete(self, container, path):
+        pass
+
+
+class AzureStorage(Storage):
+    """Storage on Azure Blob Storage."""
+
+    def __init__(self, connection_string=None, service_client=None, container_clients=()):
+        """Connect with a connection string or service client, or wrap container clients a scraper already holds."""
+        if service_client is None and connection_string:
+            from azure.storage.blob import BlobServiceClient
+
+            service_client = BlobServiceClient.from_connection_string(connection_string)
+        self.service_client = service_client
+        self._containers = {client.container_name: client for client in container_clients}
+
+    def container_client(self, container):
+        if container not in self._containers:
+            self._containers[container] = self.service_client.get_container_client(container)
+        return self._containers[container]
+
+    def _blob(self, container, path):
+        return self.container_client(container).get_blob_client(path)
+
+    def _resolve(self, container, downloader):
+        # Reference blobs are empty and name the blob holding the bytes
+        reference = (downloader.properties.metadata or {}).get(REFERENCE_METADATA_KEY)
+        return self._blob(container, reference).download_blob() if reference else downloader
+
+    def ensure_container(self, container):
+        client = self.container_client(container)
+        if not client.exists():
+            client.create_container()
+
+    def upload(self, container, path, data, metadata=None):
+        return self._blob(container, path).upload_blob(data, overwrite=True, metadata=metadata).get("etag")
+
+    def list(self, container, suffixes=None):
+        from blob_listing import iter_blobs
+
+        return iter_blobs(self.container_client(container), suffixes=suffixes)
+
+    def download(self, container, path, offset=None, length=None):
+        blob_client = self._blob(container, path)
+        if offset is None:
+            return self._resolve(container, blob_client.download_blob()).readall()
+        try:
+            return blob_client.download_blob(offset=offset, length=length).readall()
+        except HttpResponseError:
+            # A range past the end of an empty reference blob: read it from the blob holding the bytes
+            reference = (blob_client.get_blob_properties().metadata or {}).get(REFERENCE_METADATA_KEY)
+            if not reference:
+                raise
+            return self._blob(container, reference).download_blob(offset=offset, length=length).readall()
+
+    def stream(self, container, path, chunk_size=None):
+        downloader = self._resolve(container, self._blob(container, path).download_blob())
+        return downloader.chunks()
+
+    def delete(self, container, path):
+        self._blob(container, path).delete_blob()
+
+
+class LocalStorage(Storage):
+    """
+    Storage in a local directory tree, one directory per container, for benchmarks and offline runs.
+
+    Reads are memory-mapped, so documents are served from the page cache without copying them
+    through read() calls. Blob metadata is kept in a .metadata/ directory next to the containers.
+    """
+
+    METADATA_DIRECTORY = ".metadata"
+
+    def __init__(self, root=STORAGE_LOCAL_ROOT):
+        self.root = root
+
+    def _path(self, container, path):
+        return os.path.join(self.root, container, *path.split("/"))
+
+    def _metadata_path(self, container, path):
+        return os.path.join(self.root, self.METADATA_DIRECTORY, container, *path.split("/")) + ".json"
+
+    def _metadata(self, container, path):
+        try:
+            with open(self._metadata_path(container, path), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _resolve(self, container, path):
+        reference = self._metadata(container, path).get(REFERENCE_METADATA_KEY)
+        return self._path(container, reference or path)
+
+    @staticmethod
+    def _etag(stat):
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def ensure_container(self, container):
+        os.makedirs(os.path.join(self.root, container), exist_ok=True)
+
+    def upload(self, container, path, data, metadata=None):
+        target = self._path(container, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temporary = f"{target}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            if hasattr(data, "read"):
+                for chunk in iter(lambda: data.read(STORAGE_CHUNK_SIZE), b""):
+                    f.write(chunk)
+            else:
+                f.write(data)
+        os.replace(temporary, target)
+
+        metadata_path = self._metadata_path(container, path)
+        if metadata:
+            os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+            with open(metadata_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+        elif os.path.exists(metadata_path):
+            os.remove(metadata_path)
+        return self._etag(os.stat(target))
+
+    def list(self, container, suffixes=None):
+        base = os.path.join(self.root, container)
+        for directory, subdirectories, files in os.walk(base):
+            subdirectories.sort()
+            for file_name in sorted(files):
+                name = os.path.relpath(os.path.join(directory, file_name), base).replace(os.sep, "/")
+                if name.endswith(".tmp") or (suffixes is not None and not name.endswith(suffixes)):
+                    continue
+                stat = os.stat(os.path.join(directory, file_name))
+                yield BlobEntry(
+                    name, stat.st_size, self._etag(stat),
+                    datetime.fromtimestamp(stat.st_mtime, timezone.utc), self._metadata(container, name),
+                )
+
+    def _map(self, container, path):
+        try:
+            f = open(self._resolve(container, path), "rb")
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {container}/{path}")
+        with f:
+            if not os.fstat(f.fileno()).st_size:
+                # Empty files cannot be mapped
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def open(self, container, path):
+        """Return a read-only memory map of the blob (BytesIO when it is empty); close it when done."""
+        return self._map(container, path) or io.BytesIO()
+
+    def download(self, container, path, offset=None, length=None):
+        mapped = self._map(container, path)
+        if mapped is None:
+            return b""
+        with mapped:
+            if offset is None:
+                return mapped[:]
+            return mapped[offset:offset + length]
+
+    def stream(self, container, path, chunk_size=None):
+        chunk_size = chunk_size or STORAGE_CHUNK_SIZE
+        mapped = self._map(container, path)
+        if mapped is None:
+            return
+        with mapped:
+            for start in range(0, len(mapped), chunk_size):
+                yield mapped[start:start + chunk_size]
+
+    def delete(self, container, path):
+        try:
+            os.remove(self._path(container, path))
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {container}/{path}")
+        metadata_path = self._metadata_path(container, path)
+        if os.path.exists(metadata_path):
+            os.remove(metadata_path)
+
+
+# Backends by name; register others with register_backend
+_backends = {
+    "azure": lambda connection_string: AzureStorage(connection_string),
+    "local": lambda connection_string: LocalStorage(),
+}
+
+
+def register_backend(name, factory):
+    """Register a factory that builds a Storage from a connection string for STORAGE_BACKEND=name."""
+    _backends[name] = factory
+
+
+def get_storage(connection_string=None, backend=None):
+    """
+    Builds the configured storage backend.
+
+    :param connection_string: Azure connection string, unused by the local backend.
+    :param backend: Backend name, default STORAGE_BACKEND.
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend not in _backends:
+        raise ValueError(f"Unsupported storage backend: {backend}")
+    return _backends[backend](connection_string)
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import http_client
+
+# Persistent validator store location
+VALIDATOR_STORE_PATH = os.getenv("VALIDATOR_STORE_PATH", "validators.db")
+
+
+class PageFetch:
+    """Result of a conditional GET: the response is None when the page was not modified."""
+
+    def __init__(self, url, response, changed, etag=None, last_modified=None, body_hash=None):
+        self.url = url
+        self.response = response
+        self.changed = changed
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+
+
+class ValidatorStore:
+    """SQLite-backed store of ETag, Last-Modified and body hash per listing page URL."""
+
+    def __init__(self, path=VALIDATOR_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS validators ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT, checked_at REAL)"
+        )
+        self._conn.commit()
+        self._summary = Counter()
+
+    def get(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, body_hash FROM validators WHERE url = ?", (url,)
+            ).fetchone()
+
+    def fetch_page(self, url):
+        """
+        Fetches a listing page, revalidating it against the stored validators.
+
+        :param url: Page URL.
+        :return: PageFetch; changed is False when the server answered 304 or the body hash matched.
+        """
+        record = self.get(url)
+        headers = {}
+        if record:
+            etag, last_modified, _ = record
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = http_client.get(url, headers=headers)
+        self._bump("checked")
+        if response.status_code == 304:
+            self._bump("not_modified")
+            self._bump("skipped")
+            return PageFetch(url, None, False, record[0], record[1], record[2])
+
+        response.raise_for_status()
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        fetch = PageFetch(
+            url, response, True,
+            response.headers.get("ETag"), response.headers.get("Last-Modified"), body_hash,
+        )
+        if record and record[2] == body_hash:
+            self._bump("hash_match")
+            self._bump("skipped")
+            fetch.changed = False
+            # Keep any fresher validators so the next run can get a 304
+            self.record_page(fetch)
+        return fetch
+
+    def record_page(self, fetch):
+        """Store the validators of a page once its documents have been processed."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO validators (url, etag, last_modified, body_hash, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (fetch.url, fetch.etag, fetch.last_modified, fetch.body_hash, time.time()),
+            )
+            self._conn.commit()
+
+    def _bump(self, counter):
+        with self._lock:
+            self._summary[counter] += 1
+
+    def run_summary(self, since=None):
+        """Page counters (checked, skipped, not_modified, hash_match), optionally relative to an earlier summary."""
+        with self._lock:
+            summary = Counter(self._summary)
+        if since:
+            summary.subtract(since)
+        return {key: summary[key] for key in ("checked", "skipped", "not_modified", "hash_match")}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide validator store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ValidatorStore()
+    return _store
+
+
+def fetch_page(url):
+    return get_store().fetch_page(url)
+
+
+def record_page(fetch):
+    get_store().record_page(fetch)
+
+
+def run_summary(since=None):
+    return get_store().run_summary(since)
@@ -0,0 +1,321 @@
+import json
+import logging
+import mmap
+import os
+import posixpath
+import re
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from storage import LocalStorage
+
+try:
+    import numpy
+except ImportError:  # Vectors are read row by row instead of as a matrix
+    numpy = None
+
+# Vector shard configuration
+VECTOR_SHARD_DTYPE = os.getenv("VECTOR_SHARD_DTYPE", "float32")  # "float32" or "float16" (half the size)
+VECTOR_SHARD_ROWS = int(os.getenv("VECTOR_SHARD_ROWS", "10000"))  # Vectors per shard (60 MB at 1536 float32)
+VECTOR_SHARD_CACHE_DIR = os.getenv("VECTOR_SHARD_CACHE_DIR", "vector_shards_cache")  # Downloaded shards, for mmap
+
+# struct code and shard file extension per dtype; shards are little-endian
+DTYPES = {"float32": ("f", ".f32"), "float16": ("e", ".f16")}
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+_SHARD_FILE = re.compile(r"(?:^|/)\d{8}T\d{6}-[0-9a-f]{8}-\d{5}\.(?:f32|f16|metadata\.jsonl)$")
+
+
+def store_prefix(vectors_name):
+    """Return the directory of a shard store, e.g. docVectors_azure for docVectors_azure.json."""
+    return posixpath.splitext(vectors_name)[0]
+
+
+def manifest_path(vectors_name):
+    return f"{store_prefix(vectors_name)}/{MANIFEST_NAME}"
+
+
+def is_shard_file(name):
+    """Whether a blob is a shard or metadata sidecar of a shard store, e.g. to skip it in a JSONL listing."""
+    return bool(_SHARD_FILE.search(name))
+
+
+def load_manifest(storage, container, vectors_name):
+    """Return the manifest of a shard store, or None when there is none yet."""
+    try:
+        return json.loads(storage.download(container, manifest_path(vectors_name)))
+    except ResourceNotFoundError:
+        return None
+
+
+class VectorShardWriter:
+    """
+    Writes vector records to a sharded binary store as they are produced.
+
+    Each shard is a row-major matrix of float32 or float16 vectors, with a JSON Lines sidecar
+    holding the rest of each record (id, filename, text, offsets) on the matching line. Shards
+    are staged in temporary files and uploaded once full, so memory holds no more than a record.
+
+    Every write starts a new generation of shards, named by its start time and a random suffix so
+    that no two writes ever produce the same shard name, even after the store is deleted and
+    rebuilt. Shards of the previous manifest can be carried over unchanged with keep(). The
+    manifest naming the shards is uploaded on close, which switches readers over; previous shards
+    it no longer names are deleted after that. A writer that fails deletes what it wrote and
+    leaves the store as it was.
+
+    :param vectors_name: Name of the store, e.g. docVectors_azure.json; shards go under docVectors_azure/.
+    :param dtype: "float32" or "float16", default VECTOR_SHARD_DTYPE.
+    :param shard_rows: Vectors per shard, default VECTOR_SHARD_ROWS.
+    """
+
+    def __init__(self, storage, container, vectors_name, dtype=None, shard_rows=None):
+        self.storage = storage
+        self.container = container
+        self.prefix = store_prefix(vectors_name)
+        self.vectors_name = vectors_name
+        self.dtype = dtype or VECTOR_SHARD_DTYPE
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {self.dtype}")
+        self.shard_rows = shard_rows or VECTOR_SHARD_ROWS
+        self.previous = load_manifest(storage, container, vectors_name)
+        self.generation = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+        self.dimensions = None
+        self.count = 0
+        self.shards = []
+        self._written = []
+        self._filenames = set()
+        self._row = None
+        self._vectors = None
+        self._metadata = None
+        self._rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _set_dimensions(self, dimensions):
+        self.dimensions = dimensions
+        self._row = struct.Struct(f"<{dimensions}{DTYPES[self.dtype][0]}")
+
+    def _shard_path(self, extension):
+        return f"{self.prefix}/{self.generation}-{len(self._written):05d}{extension}"
+
+    def _append(self, metadata, row):
+        if self._vectors is None:
+            self._vectors = tempfile.TemporaryFile()
+            self._metadata = tempfile.TemporaryFile()
+        self._vectors.write(row)
+        self._metadata.write(json.dumps(metadata, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._filenames.add(metadata.get("filename"))
+        self._rows += 1
+        self.count += 1
+        if self._rows >= self.shard_rows:
+            self._flush()
+
+    def write(self, record):
+        """Write a record: a dict with an "embedding" vector, stored in the shard, and other JSON fields."""
+        metadata = dict(record)
+        vector = metadata.pop("embedding")
+        if self.dimensions is None:
+            self._set_dimensions(len(vector))
+        elif len(vector) != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions} dimensions, got {len(vector)} for {metadata.get('id')}")
+        self._append(metadata, self._row.pack(*vector))
+
+    def copy(self, shard, keep=None):
+        """
+        Copies the rows of a shard read with VectorShardReader, e.g. to carry them into a new generation.
+
+        :param keep: Function taking a row's metadata and returning whether to copy it; default all rows.
+        """
+        if self.dimensions is None:
+            self._set_dimensions(shard.dimensions)
+        elif shard.dimensions != self.dimensions:
+            raise ValueError(f"Cannot copy {shard.dimensions}-dimensional vectors into {self.dimensions}")
+        # Rows of the same dtype are copied as bytes, without decoding the vectors
+        same_dtype = shard.dtype == self.dtype
+        for index, metadata in enumerate(shard.metadata()):
+            if keep is None or keep(metadata):
+                row = shard.row_bytes(index) if same_dtype else self._row.pack(*shard.vector(index))
+                self._append(metadata, row)
+
+    def can_keep(self, manifest):
+        """Whether shards of a manifest can be carried over as they are: same dtype and dimensions."""
+        return manifest["dtype"] == self.dtype and self.dimensions in (None, manifest["dimensions"])
+
+    def keep(self, manifest, shard):
+        """Carry a shard of the previous manifest into this one without reading it."""
+        if not self.can_keep(manifest):
+            raise ValueError(f"Cannot keep {manifest['dtype']} shards of {manifest['dimensions']} dimensions")
+        if self.dimensions is None:
+            self._set_dimensions(manifest["dimensions"])
+        self.shards.append(shard)
+        self.count += shard["count"]
+
+    def _flush(self):
+        if not self._rows:
+            return
+        vectors_path = self._shard_path(DTYPES[self.dtype][1])
+        metadata_path = self._shard_path(".metadata.jsonl")
+        # The filenames let later writes tell which shards hold a re-indexed document
+        shard = {"vectors": vectors_path, "metadata": metadata_path, "count": self._rows,
+                 "bytes": self._vectors.tell(), "metadata_bytes": self._metadata.tell(),
+                 "filenames": sorted(name for name in self._filenames if name is not None)}
+        # Recorded before uploading, so a failed upload is cleaned up by abort()
+        self.shards.append(shard)
+        self._written.append(shard)
+        self._filenames = set()
+        for path, staged in ((vectors_path, self._vectors), (metadata_path, self._metadata)):
+            with staged:
+                staged.seek(0)
+                self.storage.upload(self.container, path, staged)
+        self._vectors = self._metadata = None
+        self._rows = 0
+
+    def close(self):
+        """Upload the last shard and the manifest; return the manifest."""
+        self._flush()
+        manifest = {
+            "format": FORMAT_VERSION, "generation": self.generation, "dtype": self.dtype,
+            "dimensions": self.dimensions, "count": self.count, "shards": self.shards,
+        }
+        self.storage.upload(self.container, manifest_path(self.vectors_name), json.dumps(manifest, indent=1))
+        if self.previous:
+            current = {shard["vectors"] for shard in self.shards}
+            self._delete([shard for shard in self.previous["shards"] if shard["vectors"] not in current])
+        logging.info(f"Wrote {self.count} vectors in {len(self.shards)} shards ({len(self._written)} new) "
+                     f"to {self.container}/{self.prefix}/")
+        return manifest
+
+    def abort(self):
+        """Delete the shards written so far, leaving the previous generation in place."""
+        for staged in (self._vectors, self._metadata):
+            if staged is not None:
+                staged.close()
+        self._vectors = self._metadata = None
+        self._delete(self._written)
+
+    def _delete(self, shards):
+        for shard in shards:
+            for path in (shard["vectors"], shard["metadata"]):
+                try:
+                    self.storage.delete(self.container, path)
+                except ResourceNotFoundError:
+                    pass
+
+
+class VectorShard:
+    """A memory-mapped shard: vectors by row number, with their metadata in the same order."""
+
+    def __init__(self, info, dtype, dimensions, vectors, metadata):
+        self.info = info
+        self.dtype = dtype
+        self.dimensions = dimensions
+        self.count = info["count"]
+        self._row = struct.Struct(f"<{dimensions}{DTYPES[dtype][0]}")
+        self._vectors = vectors
+        self._metadata = metadata
+
+    def __len__(self):
+        return self.count
+
+    def row_bytes(self, index):
+        return self._vectors[index * self._row.size:(index + 1) * self._row.size]
+
+    def vector(self, index):
+        return list(self._row.unpack_from(self._vectors, index * self._row.size))
+
+    def matrix(self):
+        """Return the vectors as a count x dimensions numpy array over the mapped shard, without copying."""
+        if numpy is None:
+            raise RuntimeError("numpy is required for matrix(); use vector() to read rows")
+        return numpy.frombuffer(self._vectors, dtype="<f4" if self.dtype == "float32" else "<f2",
+                                count=self.count * self.dimensions).reshape(self.count, self.dimensions)
+
+    def metadata(self):
+        """Yield the metadata dict of each row, in row order."""
+        self._metadata.seek(0)
+        for line in iter(self._metadata.readline, b""):
+            yield json.loads(line)
+
+    def __iter__(self):
+        """Yield each row as a record, with the vector back under "embedding"."""
+        for index, metadata in enumerate(self.metadata()):
+            metadata["embedding"] = self.vector(index)
+            yield metadata
+
+    def close(self):
+        self._vectors.close()
+        self._metadata.close()
+
+
+class VectorShardReader:
+    """
+    Reads a shard store written by VectorShardWriter, memory-mapping one shard at a time.
+
+    Blobs on LocalStorage are mapped in place; others are downloaded to cache_dir first.
+    Shard names are unique to the write that produced them, so a cached shard never goes stale.
+
+    :param cache_dir: Directory for downloaded shards, default VECTOR_SHARD_CACHE_DIR.
+    """
+
+    def __init__(self, storage, container, vectors_name, cache_dir=None):
+        self.storage = storage
+        self.container = container
+        self.cache_dir = cache_dir or VECTOR_SHARD_CACHE_DIR
+        self.manifest = load_manifest(storage, container, vectors_name)
+        if self.manifest is None:
+            raise ResourceNotFoundError(f"No vector shard store at {container}/{manifest_path(vectors_name)}")
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector shard format: {self.manifest.get('format')}")
+        self.dtype = self.manifest["dtype"]
+        self.dimensions = self.manifest["dimensions"]
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def _map(self, path, size):
+        """Map a shard blob; the caller closes the map (VectorShard.close does)."""
+        if isinstance(self.storage, LocalStorage):
+            return self.storage.open(self.container, path)
+        local = os.path.join(self.cache_dir, self.container, *path.split("/"))
+        if not os.path.exists(local) or os.path.getsize(local) != size:
+            os.makedirs(os.path.dirname(local), exist_ok=True)
+            temporary = f"{local}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                for chunk in self.storage.stream(self.container, path):
+                    f.write(chunk)
+            os.replace(temporary, local)
+        with open(local, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def shards(self, infos=None):
+        """Yield each VectorShard mapped, or those of the given manifest entries; each is unmapped once the next is requested."""
+        for info in self.manifest["shards"] if infos is None else infos:
+            vectors = self._map(info["vectors"], info["bytes"])
+            try:
+                metadata = self._map(info["metadata"], info["metadata_bytes"])
+            except BaseException:
+                vectors.close()
+                raise
+            shard = VectorShard(info, self.dtype, self.dimensions, vectors, metadata)
+            try:
+                yield shard
+            finally:
+                shard.close()
+
+    def __iter__(self):
+        """Yield every record, with its vector under "embedding" as in the JSON store."""
+        for shard in self.shards():
+            yield from shard
@@ -0,0 +1,349 @@
+import abc
+import argparse
+import importlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Work distribution configuration
+WORK_QUEUE_URL = os.getenv("WORK_QUEUE_URL", "sqlite:///crawl_state/work_queue.db")
+WORK_LEASE_SECONDS = float(os.getenv("WORK_LEASE_SECONDS", "300"))  # Lease length; renewed while an item runs
+WORK_BATCH_SIZE = int(os.getenv("WORK_BATCH_SIZE", "1"))  # Items leased per round trip
+WORK_MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", "5"))  # Attempts before an item is parked as failed
+WORK_POLL_SECONDS = float(os.getenv("WORK_POLL_SECONDS", "5"))  # Idle wait when the queue is empty
+WORK_QUEUE_TIMEOUT = float(os.getenv("WORK_QUEUE_TIMEOUT", "30"))  # Seconds per request to a queue server
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class WorkQueue(abc.ABC):
+    """
+    Leased work-item queue shared by crawler replicas.
+
+    A worker leases items for a limited time and renews the lease while it works on them.
+    Items whose lease runs out (the replica died or was scaled away) become available to
+    other workers again, so replicas can join or leave without losing work. A lease counts as
+    an attempt, so an item whose leases keep running out is parked as failed like one that
+    keeps raising.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, items):
+        """
+        Add items as {"id": ..., "payload": ...}; return how many were queued.
+
+        Items already pending or leased are left alone. Done and failed items are queued again
+        with their attempts reset, so a scheduled recrawl re-enqueues the same URLs.
+        """
+
+    @abc.abstractmethod
+    def lease(self, worker_id, count=1, lease_seconds=WORK_LEASE_SECONDS):
+        """Lease up to count available items, returned as (id, payload) pairs."""
+
+    @abc.abstractmethod
+    def renew(self, worker_id, item_ids, lease_seconds=WORK_LEASE_SECONDS):
+        pass
+
+    @abc.abstractmethod
+    def complete(self, worker_id, item_id):
+        pass
+
+    @abc.abstractmethod
+    def fail(self, worker_id, item_id, error):
+        """Release a failed item for retry, or park it once it has used WORK_MAX_ATTEMPTS."""
+
+    @abc.abstractmethod
+    def counts(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    WorkQueue on a SQLite file, for processes on one host.
+
+    WAL mode needs shared memory between the processes, so the file must not be shared by
+    replicas over a network filesystem. Serve it to replicas with serve() instead.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS work_items ("
+            "id TEXT PRIMARY KEY, payload TEXT, state TEXT, worker TEXT, lease_until REAL, "
+            "attempts INTEGER DEFAULT 0, error TEXT, updated_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS work_items_state ON work_items (state, lease_until)")
+
+    def _transaction(self, statements):
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(cursor)
+                cursor.execute("COMMIT")
+                return result
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, items):
+        now = time.time()
+        rows = [(item["id"], json.dumps(item.get("payload")), PENDING, now, DONE, FAILED) for item in items]
+        return self._transaction(lambda cursor: cursor.executemany(
+            "INSERT INTO work_items (id, payload, state, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET payload = excluded.payload, state = excluded.state, worker = NULL, "
+            "lease_until = NULL, attempts = 0, error = NULL, updated_at = excluded.updated_at "
+            "WHERE work_items.state IN (?, ?)",
+            rows,
+        ).rowcount)
+
+    def lease(self, worker_id, count=1, lease_seconds=WORK_LEASE_SECONDS):
+        def statements(cursor):
+            now = time.time()
+            # Expired leases that used the last attempt (e.g. an item that kills its worker) are parked
+            cursor.execute(
+                "UPDATE work_items SET state = ?, error = ?, updated_at = ? "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "Lease expired", now, LEASED, now, WORK_MAX_ATTEMPTS),
+            )
+            rows = cursor.execute(
+                "SELECT id, payload FROM work_items WHERE state = ? OR (state = ? AND lease_until < ?) "
+                "ORDER BY updated_at LIMIT ?",
+                (PENDING, LEASED, now, count),
+            ).fetchall()
+            cursor.executemany(
+                "UPDATE work_items SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                [(LEASED, worker_id, now + lease_seconds, now, item_id) for item_id, _ in rows],
+            )
+            return [(item_id, json.loads(payload)) for item_id, payload in rows]
+        return self._transaction(statements)
+
+    def renew(self, worker_id, item_ids, lease_seconds=WORK_LEASE_SECONDS):
+        until = time.time() + lease_seconds
+        self._transaction(lambda cursor: cursor.executemany(
+            "UPDATE work_items SET lease_until = ? WHERE id = ? AND worker = ? AND state = ?",
+            [(until, item_id, worker_id, LEASED) for item_id in item_ids],
+        ))
+
+    def complete(self, worker_id, item_id):
+        self._transaction(lambda cursor: cursor.execute(
+            "UPDATE work_items SET state = ?, updated_at = ? WHERE id = ? AND worker = ?",
+            (DONE, time.time(), item_id, worker_id),
+        ))
+
+    def fail(self, worker_id, item_id, error):
+        self._transaction(lambda cursor: cursor.execute(
+            "UPDATE work_items SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ?, updated_at = ? "
+            "WHERE id = ? AND worker = ?",
+            (WORK_MAX_ATTEMPTS, FAILED, PENDING, str(error), time.time(), item_id, worker_id),
+        ))
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM work_items GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+
+class HttpWorkQueue(WorkQueue):
+    """WorkQueue client for a queue served by serve(), e.g. http://crawler-work-queue:8080."""
+
+    def __init__(self, base_url, timeout=WORK_QUEUE_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method, **arguments):
+        import http_client
+
+        response = http_client.get_session().post(f"{self.base_url}/{method}", json=arguments, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def enqueue(self, items):
+        return self._call("enqueue", items=list(items))
+
+    def lease(self, worker_id, count=1, lease_seconds=WORK_LEASE_SECONDS):
+        return [tuple(item) for item in self._call("lease", worker_id=worker_id, count=count,
+                                                    lease_seconds=lease_seconds)]
+
+    def renew(self, worker_id, item_ids, lease_seconds=WORK_LEASE_SECONDS):
+        self._call("renew", worker_id=worker_id, item_ids=list(item_ids), lease_seconds=lease_seconds)
+
+    def complete(self, worker_id, item_id):
+        self._call("complete", worker_id=worker_id, item_id=item_id)
+
+    def fail(self, worker_id, item_id, error):
+        self._call("fail", worker_id=worker_id, item_id=item_id, error=str(error))
+
+    def counts(self):
+        return self._call("counts")
+
+
+def serve(queue, host="0.0.0.0", port=8080):
+    """
+    Serves a WorkQueue to crawler replicas over HTTP until interrupted.
+
+    Each call is a POST to /<method> with the method's arguments as a JSON object, answered with
+    {"result": ...}. Run a single server process next to the queue's SQLite file.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.strip("/")
+            if method not in ("enqueue", "lease", "renew", "complete", "fail", "counts"):
+                self.send_error(404)
+                return
+            arguments = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            try:
+                result = getattr(queue, method)(**arguments)
+            except Exception as e:
+                logging.error(f"Work queue call {method} failed: {e}")
+                self.send_error(500, str(e))
+                return
+            body = json.dumps({"result": result}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logging.info(f"Serving the work queue on {host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# Backends by URL scheme; register others (e.g. Azure Queue Storage) with register_backend
+_backends = {
+    # sqlite:///relative/path or sqlite:////absolute/path
+    "sqlite": lambda location: SQLiteWorkQueue(location[1:]),
+    "http": lambda location: HttpWorkQueue(f"http://{location}"),
+    "https": lambda location: HttpWorkQueue(f"https://{location}"),
+}
+
+
+def register_backend(scheme, factory):
+    """Register a factory that builds a WorkQueue from the part of the URL after '<scheme>://'."""
+    _backends[scheme] = factory
+
+
+def open_queue(url=WORK_QUEUE_URL):
+    """Open the work queue named by a URL such as sqlite:///crawl_state/work_queue.db or http://host:8080."""
+    scheme, _, location = url.partition("://")
+    if scheme not in _backends:
+        raise ValueError(f"Unsupported work queue backend: {scheme}")
+    return _backends[scheme](location)
+
+
+def _renew_leases(queue, worker_id, active, active_lock, stop, lease_seconds):
+    while not stop.wait(lease_seconds / 3):
+        with active_lock:
+            item_ids = list(active)
+        if not item_ids:
+            continue
+        try:
+            queue.renew(worker_id, item_ids, lease_seconds)
+        except Exception as e:
+            # Keep renewing: the next round may reach the queue before the leases run out
+            logging.error(f"Worker {worker_id} could not renew its leases: {e}")
+
+
+def run_worker(queue, scrape_fn, worker_id=None, batch_size=WORK_BATCH_SIZE, lease_seconds=WORK_LEASE_SECONDS,
+               exit_when_empty=False):
+    """
+    Leases URLs from the queue and scrapes them until stopped.
+
+    :param queue: WorkQueue to lease from.
+    :param scrape_fn: Function called with each URL, e.g. forprompt.scrape_case_documents.
+    :param worker_id: Unique worker name; defaults to the pod hostname plus a random suffix.
+    :param exit_when_empty: Return once no work is left instead of polling for more.
+    :return: Number of items processed.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+    active = set()
+    active_lock = threading.Lock()
+    stop = threading.Event()
+    renewer = threading.Thread(
+        target=_renew_leases, args=(queue, worker_id, active, active_lock, stop, lease_seconds), daemon=True
+    )
+    renewer.start()
+    processed = 0
+    try:
+        while True:
+            items = queue.lease(worker_id, batch_size, lease_seconds)
+            if not items:
+                if exit_when_empty:
+                    return processed
+                time.sleep(WORK_POLL_SECONDS)
+                continue
+            with active_lock:
+                active.update(item_id for item_id, _ in items)
+            for item_id, payload in items:
+                try:
+                    scrape_fn(payload["url"])
+                    queue.complete(worker_id, item_id)
+                except Exception as e:
+                    logging.error(f"Worker {worker_id} failed {item_id}: {e}")
+                    queue.fail(worker_id, item_id, e)
+                with active_lock:
+                    active.discard(item_id)
+                processed += 1
+    finally:
+        stop.set()
+
+
+def _load_function(spec):
+    module_name, _, function_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribute crawl targets across crawler replicas.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add URLs to the work queue")
+    enqueue_parser.add_argument("urls", nargs="+")
+    worker_parser = subparsers.add_parser("worker", help="Lease and scrape URLs from the work queue")
+    worker_parser.add_argument("--scraper", default="forprompt:scrape_case_documents",
+                               help="module:function called with each URL")
+    worker_parser.add_argument("--exit-when-empty", action="store_true")
+    subparsers.add_parser("status", help="Show item counts per state")
+    serve_parser = subparsers.add_parser("serve", help="Serve a SQLite work queue to replicas over HTTP")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    queue = open_queue()
+    if args.command == "serve":
+        serve(queue, port=args.port)
+        return
+    if args.command == "enqueue":
+        added = queue.enqueue({"id": url, "payload": {"url": url}} for url in args.urls)
+        logging.info(f"Enqueued {added} URLs")
+    elif args.command == "worker":
+        processed = run_worker(queue, _load_function(args.scraper), exit_when_empty=args.exit_when_empty)
+        logging.info(f"Worker processed {processed} items")
+    logging.info(f"Work queue: {queue.counts()}")
+
+
+if __name__ == "__main__":
+    main()